@@ -0,0 +1,65 @@
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from slow_looking import JourneyLibrary, SQLiteJourneyLibrary, SlowLookingJourney
+
+
+def _timed(label, fn, count):
+    """Run fn once and print per-journey timing"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<34} {elapsed:7.3f}s   {elapsed / count * 1e6:7.1f} µs/journey")
+    return elapsed
+
+
+def benchmark_journey_loads(sample_file, count=2000):
+    """Compare the old dict-then-validate load with the direct and header-only paths"""
+
+    sample = SlowLookingJourney(**json.loads(Path(sample_file).read_text()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for library_cls in (JourneyLibrary, SQLiteJourneyLibrary):
+            library = library_cls(Path(tmp) / library_cls.__name__)
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(count):
+                    library.save_journey(sample.model_copy(update={"journey_id": f"bench-{i:06d}"}))
+            ids = [entry["journey_id"] for entry in library.list_journeys()]
+
+            print(f"\n📚 {library_cls.__name__}: {count} journeys")
+
+            if isinstance(library, SQLiteJourneyLibrary):
+                read_raw = library._journey_json
+            else:
+                read_raw = lambda journey_id: (library.library_dir / f"{journey_id}.json").read_text()
+
+            def old_path():
+                # What get_journey did before: json.loads, then validate the dict
+                for journey_id in ids:
+                    SlowLookingJourney(**json.loads(read_raw(journey_id)))
+
+            def full_loads():
+                for journey_id in ids:
+                    library.get_journey(journey_id)
+
+            def header_loads():
+                for journey_id in ids:
+                    library.get_journey_header(journey_id)
+
+            baseline = _timed("json.loads + SlowLookingJourney(**)", old_path, count)
+            direct = _timed("get_journey", full_loads, count)
+            headers = _timed("get_journey_header", header_loads, count)
+
+            print(f"   → full loads {baseline / direct:.1f}x, headers {baseline / headers:.1f}x faster")
+
+
+if __name__ == "__main__":
+    benchmark_journey_loads(
+        "journeys_cache/66bf1e1e7ae85606e09341d96193be3e.json",
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    )
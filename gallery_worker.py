@@ -0,0 +1,45 @@
+import argparse
+from pathlib import Path
+
+from slow_looking import GalleryPreprocessor, SlowLookingAnalyzer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Process a gallery as one of several nodes sharing a journeys_cache "
+                    "(start one per machine or process; each journey is generated once)"
+    )
+    parser.add_argument("artwork_dir", type=Path)
+    parser.add_argument("--cache-dir", type=Path, default=Path("journeys_cache"),
+                        help="Cache directory shared by all nodes")
+    parser.add_argument("--output-dir", type=Path, default=Path("gallery_journeys"),
+                        help="Where this node writes journeys and its report (keep it per node)")
+    parser.add_argument("--node-id", default=None, help="Name recorded in leases (default: hostname-pid)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Images this node works on at once")
+    parser.add_argument("--visibility-timeout", type=float, default=300.0,
+                        help="Seconds before a dead node's leases can be reclaimed")
+    parser.add_argument("--poll-seconds", type=float, default=5.0,
+                        help="Delay between checks on images leased by other nodes")
+    parser.add_argument("--resume", action="store_true", help="Skip images finished by an earlier run")
+    parser.add_argument("--near-duplicate-distance", type=int, default=5,
+                        help="Max dHash bit difference for reusing the journey of a resized or "
+                             "re-encoded copy of an image")
+    parser.add_argument("--exact-only", action="store_true",
+                        help="Only reuse journeys of byte-identical images (e.g. for series works)")
+    parser.add_argument("--archive-responses", action="store_true",
+                        help="Keep raw API replies in cache_dir/_responses for reparse_responses.py")
+    args = parser.parse_args()
+
+    analyzer = SlowLookingAnalyzer(
+        cache_dir=args.cache_dir,
+        near_duplicate_distance=None if args.exact_only else args.near_duplicate_distance,
+        archive_responses=args.archive_responses
+    )
+    GalleryPreprocessor(analyzer, output_dir=args.output_dir).process_gallery_distributed(
+        args.artwork_dir,
+        max_concurrency=args.concurrency,
+        visibility_timeout=args.visibility_timeout,
+        poll_seconds=args.poll_seconds,
+        node_id=args.node_id,
+        resume=args.resume
+    )
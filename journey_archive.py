@@ -0,0 +1,47 @@
+import argparse
+from pathlib import Path
+
+from slow_looking import (
+    JOURNEY_CODECS, JourneyArchive, pack_journey_dir, unpack_journey_archive
+)
+
+
+def show_archive_info(archive_file):
+    """Print an archive's codec, size and a few keys"""
+    size = Path(archive_file).stat().st_size
+    with JourneyArchive(Path(archive_file)) as archive:
+        print(f"📦 {archive_file}")
+        print(f"   Journeys: {len(archive)}")
+        print(f"   Codec: {archive.codec}")
+        print(f"   Size: {size / 1024:.1f} KB ({size / max(len(archive), 1):.0f} bytes/journey)")
+        for i, key in enumerate(archive.keys()):
+            if i == 5:
+                print("   ...")
+                break
+            print(f"   • {key}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between journey JSON folders and packed archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack = commands.add_parser("pack", help="Folder of <key>.json journeys -> archive")
+    pack.add_argument("journey_dir", type=Path)
+    pack.add_argument("archive_file", type=Path)
+    pack.add_argument("--codec", choices=JOURNEY_CODECS, default="json+zlib")
+
+    unpack = commands.add_parser("unpack", help="Archive -> folder of <key>.json journeys")
+    unpack.add_argument("archive_file", type=Path)
+    unpack.add_argument("journey_dir", type=Path)
+    unpack.add_argument("--compact", action="store_true", help="Write JSON without indentation")
+
+    info = commands.add_parser("info", help="Describe an archive")
+    info.add_argument("archive_file", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "pack":
+        pack_journey_dir(args.journey_dir, args.archive_file, args.codec)
+    elif args.command == "unpack":
+        unpack_journey_archive(args.archive_file, args.journey_dir, indent=None if args.compact else 2)
+    else:
+        show_archive_info(args.archive_file)
@@ -0,0 +1,472 @@
+# ============================================================================
+# SLOW LOOKING - HTTP SERVICE
+# Journeys and the library over HTTP, for the mobile backend
+# ============================================================================
+
+"""
+Endpoints (all responses are JSON):
+
+    POST /journeys?filename=...        Image bytes as the body, Content-Type image/*;
+                                       filename becomes the journey's image_filename.
+                                       200 + journey if cached, else 202 + job
+    GET  /jobs/<job_id>                Job status; "done" jobs link their journey
+    GET  /journeys/<cache_key>         A generated journey (ETag / If-None-Match)
+    GET  /library/journeys?...         library.query: artist, title_prefix,
+                                       completed_after, completed_before, min_steps,
+                                       max_steps, min_duration, max_duration,
+                                       limit (1-100), cursor
+    GET  /library/journeys/<journey_id>  A saved journey (ETag / If-None-Match)
+    GET  /library/search?q=...&limit=  Full-text search, if the library has an index
+    GET  /library/stats                library.get_stats
+    GET  /health                       Job counts and analyzer stats
+
+Only the standard library's asyncio is used for serving. Everything that
+blocks (hashing uploads, disk reads, generating journeys) runs in thread
+pools, so the event loop stays free to answer other requests.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Literal, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from pydantic import BaseModel
+
+from slow_looking import JourneyLibrary, MEDIA_TYPES, SlowLookingAnalyzer
+
+
+UPLOAD_SUFFIXES = {media_type: suffix for suffix, media_type in reversed(MEDIA_TYPES.items())}
+
+LIBRARY_QUERY_PARAMS = (
+    "artist", "title_prefix", "completed_after", "completed_before",
+    "min_steps", "max_steps", "min_duration", "max_duration", "limit", "cursor"
+)
+INTEGER_PARAMS = ("min_steps", "max_steps", "min_duration", "max_duration", "limit")
+
+MAX_PAGE_LIMIT = 100  # Larger limits are clamped
+MAX_FILENAME_BYTES = 200  # Leaves room for the temp-file prefix and suffix
+
+REASONS = {
+    200: "OK", 202: "Accepted", 304: "Not Modified", 400: "Bad Request",
+    404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    415: "Unsupported Media Type", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+
+class HTTPError(Exception):
+    """Turned into a JSON error response"""
+
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class JourneyJob(BaseModel):
+    """A journey being generated for an uploaded image"""
+    job_id: str
+    cache_key: str
+    status: Literal["queued", "running", "done", "error"] = "queued"
+    submitted_at: str
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class JourneyService:
+    """Async HTTP front end for a SlowLookingAnalyzer and a JourneyLibrary"""
+
+    def __init__(
+        self,
+        analyzer: SlowLookingAnalyzer,
+        library: Optional[JourneyLibrary] = None,
+        uploads_dir: Path = Path("uploads"),
+        max_generations: int = 4,
+        max_queued_jobs: int = 256,
+        max_upload_bytes: int = 30 * 1024 * 1024,
+        io_workers: int = 16,
+        finished_jobs_kept: int = 10_000
+    ):
+        """
+        Initialize the service
+
+        Args:
+            analyzer: Generates and caches journeys
+            library: Saved journeys to list and query (None = no /library routes)
+            uploads_dir: Where uploaded images are kept, under their content hash
+            max_generations: create_journey calls running at once
+            max_queued_jobs: Unfinished jobs allowed before uploads get a 503
+            max_upload_bytes: Largest accepted image
+            io_workers: Threads for hashing, disk reads and library queries
+            finished_jobs_kept: Completed jobs remembered for GET /jobs
+        """
+        self.analyzer = analyzer
+        self.library = library
+        self.uploads_dir = uploads_dir
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+        self.max_queued_jobs = max_queued_jobs
+        self.max_upload_bytes = max_upload_bytes
+        self.finished_jobs_kept = finished_jobs_kept
+
+        self._generation_pool = ThreadPoolExecutor(max_workers=max_generations, thread_name_prefix="generate")
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="service-io")
+
+        self.jobs = OrderedDict()  # job_id -> JourneyJob, oldest first
+        self._active_jobs = {}     # cache_key -> unfinished JourneyJob
+        self._tasks = set()
+        self.stats = {"requests": 0, "not_modified": 0, "jobs_submitted": 0, "jobs_joined": 0}
+
+        self._routes = [
+            ("POST", re.compile(r"/journeys"), self.submit_image),
+            ("GET", re.compile(r"/jobs/([0-9a-f]+)"), self.get_job),
+            ("GET", re.compile(r"/journeys/([0-9a-f]+)"), self.get_cached_journey),
+            ("GET", re.compile(r"/library/journeys"), self.list_library),
+            ("GET", re.compile(r"/library/journeys/([\w.-]+)"), self.get_library_journey),
+            ("GET", re.compile(r"/library/search"), self.search_library),
+            ("GET", re.compile(r"/library/stats"), self.library_stats),
+            ("GET", re.compile(r"/health"), self.health),
+        ]
+
+    async def _blocking(self, fn, *args):
+        """Run a blocking call on the I/O pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_pool, fn, *args)
+
+    # ------------------------------------------------------------------------
+    # Handlers: each returns (status, body bytes, extra headers)
+    # ------------------------------------------------------------------------
+
+    async def submit_image(self, request: dict):
+        filename = Path(request["query"].get("filename", "").replace("\\", "/")).name
+        if len(filename.encode("utf-8")) > MAX_FILENAME_BYTES:
+            raise HTTPError(400, f"filename is limited to {MAX_FILENAME_BYTES} bytes")
+        suffix = UPLOAD_SUFFIXES.get(request["headers"].get("content-type", "").split(";")[0].strip())
+        if suffix is None:
+            suffix = Path(filename).suffix.lower()
+            if suffix not in MEDIA_TYPES:
+                raise HTTPError(415, "Send the image with an image/* Content-Type or a filename")
+        if not request["body"]:
+            raise HTTPError(400, "Empty upload")
+
+        cache_key, image_path = await self._blocking(self._store_upload, request["body"], suffix, filename)
+
+        cached = await self._blocking(self.analyzer.find_cached_journey, image_path, cache_key)
+        if cached is not None:
+            if cached.image_filename != image_path.name:
+                cached = cached.model_copy(update={"image_filename": image_path.name})
+            return self._journey_response(request, cached.model_dump_json().encode("utf-8"))
+
+        job = self._active_jobs.get(cache_key)
+        if job is not None:
+            # Same image already on its way; share the job
+            self.stats["jobs_joined"] += 1
+            return self._json(202, self._job_body(job))
+
+        if len(self._active_jobs) >= self.max_queued_jobs:
+            raise HTTPError(503, "Too many journeys being generated", {"Retry-After": "30"})
+
+        job = JourneyJob(job_id=uuid.uuid4().hex, cache_key=cache_key, submitted_at=datetime.now().isoformat())
+        self.jobs[job.job_id] = job
+        self._active_jobs[cache_key] = job
+        self.stats["jobs_submitted"] += 1
+
+        task = asyncio.create_task(self._run_job(job, image_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return self._json(202, self._job_body(job))
+
+    def _store_upload(self, data: bytes, suffix: str, filename: str = "") -> tuple[str, Path]:
+        """
+        Keep an upload as uploads_dir/<content hash>/<filename>
+
+        The hash is also the cache key; the client's filename is kept so
+        journeys generated from the upload carry it. The file always ends in
+        `suffix`, which is what the analyzer reads the media type from.
+        """
+        cache_key = hashlib.md5(data).hexdigest()
+        if not filename or filename.startswith("."):
+            filename = f"{cache_key}{suffix}"
+        elif MEDIA_TYPES.get(Path(filename).suffix.lower()) != MEDIA_TYPES[suffix]:
+            filename += suffix
+        image_path = self.uploads_dir / cache_key / filename
+        if not image_path.exists():
+            image_path.parent.mkdir(exist_ok=True)
+            tmp_path = image_path.with_name(f".{image_path.name}.{uuid.uuid4().hex}.tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(image_path)
+        return cache_key, image_path
+
+    async def _run_job(self, job: JourneyJob, image_path: Path):
+        """Generate off the event loop, then record the outcome"""
+        loop = asyncio.get_running_loop()
+
+        def generate():
+            job.status = "running"
+            return self.analyzer.create_journey(image_path)
+
+        try:
+            await loop.run_in_executor(self._generation_pool, generate)
+            job.status = "done"
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self._active_jobs.pop(job.cache_key, None)
+            self._forget_old_jobs()
+
+    def _forget_old_jobs(self):
+        finished = len(self.jobs) - len(self._active_jobs)
+        for job_id in list(self.jobs):
+            if finished <= self.finished_jobs_kept:
+                break
+            if self.jobs[job_id].status in ("done", "error"):
+                del self.jobs[job_id]
+                finished -= 1
+
+    def _job_body(self, job: JourneyJob) -> dict:
+        body = job.model_dump()
+        body["links"] = {"self": f"/jobs/{job.job_id}"}
+        if job.status == "done":
+            body["links"]["journey"] = f"/journeys/{job.cache_key}"
+        return body
+
+    async def get_job(self, request: dict, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job {job_id}")
+        return self._json(200, self._job_body(job))
+
+    async def get_cached_journey(self, request: dict, cache_key: str):
+        journey = await self._blocking(self.analyzer.cache.get, cache_key)
+        if journey is None:
+            raise HTTPError(404, f"No journey for {cache_key}")
+        return self._journey_response(request, journey.model_dump_json().encode("utf-8"))
+
+    async def get_library_journey(self, request: dict, journey_id: str):
+        library = self._require_library()
+        journey = await self._blocking(library.get_journey, journey_id)
+        if journey is None:
+            raise HTTPError(404, f"No saved journey {journey_id}")
+        return self._journey_response(request, journey.model_dump_json().encode("utf-8"))
+
+    async def list_library(self, request: dict):
+        library = self._require_library()
+        params = dict(request["query"])
+        for name, value in params.items():
+            if name not in LIBRARY_QUERY_PARAMS:
+                raise HTTPError(400, f"Unknown parameter: {name}")
+            if name in INTEGER_PARAMS:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    raise HTTPError(400, f"{name} must be an integer")
+        params["limit"] = self._page_limit(params.get("limit", 20))
+
+        try:
+            page = await self._blocking(lambda: library.query(**params))
+        except ValueError:
+            raise HTTPError(400, "Invalid cursor")
+        return self._json(200, page)
+
+    async def search_library(self, request: dict):
+        library = self._require_library()
+        if library.search_index is None:
+            raise HTTPError(404, "This library has no search index")
+        try:
+            limit = self._page_limit(int(request["query"].get("limit", 10)))
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer")
+        results = await self._blocking(
+            library.search_index.search, request["query"].get("q", ""), limit, "library"
+        )
+        return self._json(200, {"results": results})
+
+    def _page_limit(self, limit: int) -> int:
+        """400 for limits below 1; larger ones are capped at MAX_PAGE_LIMIT"""
+        if limit < 1:
+            raise HTTPError(400, "limit must be at least 1")
+        return min(limit, MAX_PAGE_LIMIT)
+
+    async def library_stats(self, request: dict):
+        library = self._require_library()
+        return self._json(200, await self._blocking(library.get_stats))
+
+    async def health(self, request: dict):
+        return self._json(200, {
+            "status": "ok",
+            "active_jobs": len(self._active_jobs),
+            "service": self.stats,
+            "analyzer": self.analyzer.stats,
+        })
+
+    def _require_library(self) -> JourneyLibrary:
+        if self.library is None:
+            raise HTTPError(404, "No library configured")
+        return self.library
+
+    def _json(self, status: int, payload: dict):
+        return status, json.dumps(payload).encode("utf-8"), {}
+
+    def _journey_response(self, request: dict, body: bytes):
+        """200 with an ETag, or 304 if the client already has this version"""
+        etag = _etag(body)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request["headers"].get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return 304, b"", headers
+        return 200, body, headers
+
+    # ------------------------------------------------------------------------
+    # HTTP/1.1 plumbing
+    # ------------------------------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[dict]:
+        """Parse one request, or None when the client has closed the connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        content_length = headers.get("content-length") or "0"
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPError(400, "Invalid Content-Length")
+        length = int(content_length)
+        if length > self.max_upload_bytes:
+            raise HTTPError(413, f"Uploads are limited to {self.max_upload_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return {
+            "method": method,
+            "path": url.path,
+            "query": dict(parse_qsl(url.query)),
+            "headers": headers,
+            "body": body,
+            "keep_alive": headers.get("connection", "").lower() != "close" and version == "HTTP/1.1",
+        }
+
+    async def _dispatch(self, request: dict):
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(request["path"])
+            if match:
+                if method == request["method"]:
+                    return await handler(request, *match.groups())
+                allowed = True
+        if allowed:
+            raise HTTPError(405, f"{request['method']} not allowed on {request['path']}")
+        raise HTTPError(404, f"No route for {request['path']}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = request["keep_alive"]
+                    self.stats["requests"] += 1
+                    status, body, headers = await self._dispatch(request)
+                except HTTPError as e:
+                    status, body, headers = e.status, json.dumps({"error": str(e)}).encode("utf-8"), e.headers
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    print(f"✗ Error serving request: {e}")
+                    status, body, headers = 500, json.dumps({"error": "Internal error"}).encode("utf-8"), {}
+
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+                if status != 304:
+                    head.append("Content-Type: application/json")
+                    head.append(f"Content-Length: {len(body)}")
+                head += [f"{name}: {value}" for name, value in headers.items()]
+                head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # Client went away, or the server is shutting down
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        """Start listening; port 0 picks a free port (see server.sockets)"""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        """Serve until cancelled"""
+        server = await self.start(host, port)
+        print(f"🌐 Serving journeys on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Stop the worker pools (jobs still running are finished first)"""
+        self._generation_pool.shutdown(wait=True)
+        self._io_pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve slow looking journeys over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-dir", type=Path, default=Path("journeys_cache"))
+    parser.add_argument("--library-dir", type=Path, default=Path("user_library"))
+    parser.add_argument("--uploads-dir", type=Path, default=Path("uploads"))
+    parser.add_argument("--max-generations", type=int, default=4, help="Journeys generated at once")
+    args = parser.parse_args()
+
+    service = JourneyService(
+        SlowLookingAnalyzer(cache_dir=args.cache_dir),
+        library=JourneyLibrary(library_dir=args.library_dir),
+        uploads_dir=args.uploads_dir,
+        max_generations=args.max_generations
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
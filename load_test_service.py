@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image
+
+from journey_service import JourneyService
+from slow_looking import JourneyLibrary, SlowLookingAnalyzer, SlowLookingJourney
+
+
+class StubMessages:
+    """Stands in for client.messages: replies with a canned journey after a delay"""
+
+    def __init__(self, journey_json: str, latency_seconds: float):
+        self.text = "```json\n" + journey_json + "\n```"
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def create(self, **params):
+        self.calls += 1
+        time.sleep(self.latency_seconds * random.uniform(0.5, 1.5))
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=self.text)],
+            usage=SimpleNamespace(input_tokens=1600, output_tokens=2400,
+                                  cache_creation_input_tokens=0, cache_read_input_tokens=3000),
+            stop_reason="end_turn",
+            model="stub"
+        )
+
+
+class HTTPClient:
+    """One keep-alive connection speaking just enough HTTP/1.1 for the service"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, target: str, body: bytes = b"", headers: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+        head = [f"{method} {target} HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        lines = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        response_headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length", 0))
+        payload = await self.reader.readexactly(length) if length else b""
+
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, response_headers, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def run_load_test(
+    sample_file: Path,
+    users: int = 50,
+    duration_seconds: float = 20.0,
+    distinct_images: int = 40,
+    latency_seconds: float = 2.0,
+    max_generations: int = 8,
+    library_size: int = 500
+):
+    """
+    Drive the service with simulated visitors against a stubbed model client
+
+    Each visitor loops over: upload a photo (popular artworks come up far
+    more often, so many uploads coincide), poll the job, re-fetch the
+    journey with If-None-Match, and browse the library.
+    """
+    sample = SlowLookingJourney.model_validate_json(Path(sample_file).read_bytes())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        analyzer = SlowLookingAnalyzer(api_key="stub", cache_dir=tmp / "cache", refreshes_per_minute=None,
+                                       near_duplicate_distance=None, archive_responses=False)
+        stub = StubMessages(sample.model_dump_json(), latency_seconds)
+        analyzer.client = SimpleNamespace(messages=stub)
+
+        library = JourneyLibrary(tmp / "library")
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(library_size):
+                library.save_journey(sample.model_copy(update={"journey_id": f"load-{i:05d}"}))
+
+        images = []
+        for i in range(distinct_images):
+            buffer = io.BytesIO()
+            Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3)).save(buffer, "JPEG")
+            images.append(buffer.getvalue())
+        popularity = [1 / (rank + 1) for rank in range(distinct_images)]  # Zipf-like
+
+        service = JourneyService(analyzer, library=library, uploads_dir=tmp / "uploads",
+                                 max_generations=max_generations)
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        latencies = {}
+        statuses = {}
+        deadline = time.monotonic() + duration_seconds
+
+        async def timed(client, label, method, target, body=b"", headers=None):
+            start = time.perf_counter()
+            status, response_headers, payload = await client.request(method, target, body, headers)
+            latencies.setdefault(label, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            return status, response_headers, payload
+
+        async def visitor():
+            client = HTTPClient(port)
+            etags = {}
+            while time.monotonic() < deadline:
+                image = random.choices(images, weights=popularity)[0]
+                status, headers, payload = await timed(
+                    client, "POST /journeys", "POST", "/journeys", image, {"Content-Type": "image/jpeg"}
+                )
+                if status == 202:
+                    job = json.loads(payload)
+                    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+                        await asyncio.sleep(0.25)
+                        _, _, payload = await timed(client, "GET /jobs/<id>", "GET", f"/jobs/{job['job_id']}")
+                        job = json.loads(payload)
+                    if job["status"] != "done":
+                        continue
+                    target = f"/journeys/{job['cache_key']}"
+                    _, headers, _ = await timed(client, "GET /journeys/<key>", "GET", target)
+                    etags[target] = headers.get("etag")
+
+                # Come back to a journey already on the phone
+                if etags:
+                    target, etag = random.choice(list(etags.items()))
+                    await timed(client, "GET /journeys/<key> (If-None-Match)", "GET", target,
+                                headers={"If-None-Match": etag})
+
+                _, _, payload = await timed(client, "GET /library/journeys", "GET", "/library/journeys?limit=20")
+                page = json.loads(payload)["journeys"]
+                if page:
+                    journey_id = random.choice(page)["journey_id"]
+                    await timed(client, "GET /library/journeys/<id>", "GET", f"/library/journeys/{journey_id}")
+            await client.close()
+
+        # Event-loop lag: how late a 10ms timer fires while under load
+        lags = []
+
+        async def monitor():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - start - 0.01)
+
+        print(f"🚦 {users} visitors for {duration_seconds:.0f}s, {distinct_images} artworks, "
+              f"stub model latency ~{latency_seconds:.1f}s")
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(monitor(), *(visitor() for _ in range(users)))
+        elapsed = time.monotonic() - started
+
+        server.close()
+        await server.wait_closed()
+        service.close()
+        analyzer.asset_catalog.flush()  # Before the temp dir goes, not at exit
+        analyzer.phash_index.flush()
+
+        total = sum(len(values) for values in latencies.values())
+        print(f"\n{'Endpoint':<40}{'Count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for label, values in latencies.items():
+            print(f"{label:<40}{len(values):>7}{_percentile(values, 0.5) * 1000:>9.1f}"
+                  f"{_percentile(values, 0.95) * 1000:>9.1f}{_percentile(values, 0.99) * 1000:>9.1f}")
+        print(f"\nRequests: {total} in {elapsed:.1f}s ({total / elapsed:.0f}/s), status codes {statuses}")
+        print(f"Event loop lag: p50 {_percentile(lags, 0.5) * 1000:.1f} ms, "
+              f"max {max(lags, default=0) * 1000:.1f} ms")
+        generated = sum(1 for _ in analyzer.cache.backend.entries())
+        print(f"Model calls: {stub.calls} for {generated} journeys generated; {service.stats['jobs_joined']} uploads joined a running job, "
+              f"{service.stats['not_modified']} 304s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the journey service against a stub model")
+    parser.add_argument("--sample", type=Path,
+                        default=Path("journeys_cache/66bf1e1e7ae85606e09341d96193be3e.json"),
+                        help="Journey the stub model replies with")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent visitors")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--images", type=int, default=40, help="Distinct artworks uploaded")
+    parser.add_argument("--latency", type=float, default=2.0, help="Mean stub model latency in seconds")
+    parser.add_argument("--max-generations", type=int, default=8, help="Journeys generated at once")
+    args = parser.parse_args()
+
+    asyncio.run(run_load_test(
+        args.sample,
+        users=args.users,
+        duration_seconds=args.duration,
+        distinct_images=args.images,
+        latency_seconds=args.latency,
+        max_generations=args.max_generations
+    ))
@@ -0,0 +1,30 @@
+import argparse
+import time
+from pathlib import Path
+
+from slow_looking import DirectoryCacheBackend
+
+
+def migrate_journey_cache(cache_dir, pause_every=1000, pause_seconds=0.0):
+    """Move a flat journeys_cache into the sharded layout; safe while the cache is in use"""
+
+    backend = DirectoryCacheBackend(Path(cache_dir))
+    pending = sum(1 for _ in backend.legacy_keys())
+    print(f"📂 {cache_dir}: {pending} journeys in the flat layout")
+    if not pending:
+        return 0
+
+    start = time.time()
+    moved = backend.migrate_legacy(pause_every=pause_every, pause_seconds=pause_seconds)
+    print(f"✓ Moved {moved} journeys into shards in {time.time() - start:.1f}s")
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard a flat journeys_cache directory")
+    parser.add_argument("cache_dir", type=Path, nargs="?", default=Path("journeys_cache"))
+    parser.add_argument("--pause-every", type=int, default=1000, help="Moves between pauses")
+    parser.add_argument("--pause-seconds", type=float, default=0.0, help="Pause length, to limit I/O load")
+    args = parser.parse_args()
+
+    migrate_journey_cache(args.cache_dir, args.pause_every, args.pause_seconds)
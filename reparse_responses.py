@@ -0,0 +1,20 @@
+import argparse
+from pathlib import Path
+
+from slow_looking import DirectoryCacheBackend, JourneyCache, ResponseArchive, reparse_response_archive
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild cached journeys from archived API replies (no API calls)"
+    )
+    parser.add_argument("cache_dir", type=Path, nargs="?", default=Path("journeys_cache"))
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per core)")
+    parser.add_argument("--generation", default=None,
+                        help="Store rebuilt journeys under this generation fingerprint "
+                             "instead of the one each reply was made with")
+    args = parser.parse_args()
+
+    archive = ResponseArchive(args.cache_dir / "_responses")
+    cache = JourneyCache(DirectoryCacheBackend(args.cache_dir), memory_entries=0)
+    reparse_response_archive(archive, cache, generation=args.generation, max_workers=args.workers)
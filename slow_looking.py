@@ -12,19 +12,46 @@ ANTHROPIC_API_KEY=your_key_here
 """
 
 import os
+import atexit
 import json
 import hashlib
+import gzip
+import itertools
+import math
+import mmap
+import re
 import time
+import random
+import queue
 import base64
+import io
+import dbm
+import socket
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Literal
+from types import SimpleNamespace
+from typing import Optional, List, Literal, Iterator, Union
 from datetime import datetime
 from enum import Enum
 import uuid
+import zlib
+import typing
+import bisect
+import contextlib
 
-from anthropic import Anthropic
-from pydantic import BaseModel, Field
+from anthropic import Anthropic, APIConnectionError, APIStatusError
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
 from dotenv import load_dotenv
+from PIL import Image, ImageFile, ImageOps
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # Optional: only needed for the "msgpack+zlib" journey codec
 
 # Load environment variables
 load_dotenv()
@@ -172,6 +199,45 @@ class SlowLookingJourney(BaseModel):
     )
 
 
+class JourneyHeader(BaseModel):
+    """
+    The summary fields of a saved journey, parsed without its steps
+
+    Listing views only need these; `load()` parses the full journey from
+    the same JSON if it turns out to be needed.
+    """
+
+    journey_id: str
+    artwork: ArtworkMetadata
+    image_filename: str
+    total_steps: int
+    estimated_duration_minutes: int
+    created_at: str
+    confidence_score: float
+
+    _raw: Union[str, bytes] = PrivateAttr(default=b"")
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "JourneyHeader":
+        header = cls.model_validate_json(data)
+        header._raw = data
+        return header
+
+    def load(self) -> SlowLookingJourney:
+        """Parse the full journey"""
+        return load_journey_json(self._raw)
+
+
+def load_journey_json(data: Union[str, bytes]) -> SlowLookingJourney:
+    """
+    Parse journey JSON written by this module
+
+    Goes straight from JSON to the model in one pass, without building
+    an intermediate dict first.
+    """
+    return SlowLookingJourney.model_validate_json(data)
+
+
 # ============================================================================
 # PROMPTS - SLOW LOOKING FOCUSED
 # ============================================================================
@@ -245,6 +311,7 @@ RESPONSE FORMAT: Valid JSON matching SlowLookingJourney schema
         "medium": "medium or null"
     },
     "image_filename": "provided by system",
+    "welcome_text": "Warm invitation to the experience - max 200 chars",
     "total_steps": 3-6,
     "estimated_duration_minutes": 3-8,
     "steps": [
@@ -267,7 +334,6 @@ RESPONSE FORMAT: Valid JSON matching SlowLookingJourney schema
             "builds_on": "Connection to previous steps or null"
         }
     ],
-    "welcome_text": "Warm invitation to the experience - max 200 chars",
     "final_summary": {
         "main_takeaway": "Key insight from journey - 100-300 chars",
         "connections": "How observations connect - 150-400 chars",
@@ -293,308 +359,4763 @@ EXAMPLES OF GOOD STOPS:
 Remember: You're teaching someone to LOOK, not just telling them facts. Create moments of genuine discovery."""
 
 
+# Sent alongside the image; the instructions above live in the cached system block
+JOURNEY_REQUEST_TEXT = "Design the slow looking journey for this artwork."
+
+
 # ============================================================================
-# JOURNEY ANALYZER
+# FILE HELPERS
 # ============================================================================
 
-class SlowLookingAnalyzer:
-    """Creates guided slow looking journeys through artworks"""
-    
-    def __init__(self, api_key: Optional[str] = None, cache_dir: Optional[Path] = None):
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Write a file via temp file + rename so readers never see partial data"""
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class FileLock:
+    """Exclusive inter-process lock on a lock file (flock on POSIX, msvcrt on Windows)"""
+
+    def __init__(self, lock_file: Path):
+        self.lock_file = lock_file
+        self._handle = None
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._handle = open(self.lock_file, "a+b")
+        try:
+            import fcntl
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            self._handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            try:
+                import fcntl
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                self._handle.seek(0)
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+            self._handle.close()
+        finally:
+            self._handle = None
+            self._thread_lock.release()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one, shared by every caller"""
+
+    def __init__(self):
+        self._calls = {}  # key -> SimpleNamespace(done, result, error)
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn) -> tuple[object, bool]:
         """
-        Initialize the analyzer
-        
+        Run fn(), unless a call for this key is already running; then wait for it
+
+        Returns:
+            (result, shared): shared is True for callers that waited on
+            another caller's run. Its exception, if any, is raised in every
+            caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SimpleNamespace(done=threading.Event(), result=None, error=None)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+# ============================================================================
+# ASSET CATALOG - Memoized content hashes
+# ============================================================================
+
+class AssetRecord(BaseModel):
+    """What we know about one image file"""
+    md5: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    format: Optional[str] = None
+    dhash: Optional[str] = None
+
+
+class AssetCatalog:
+    """Persistent image catalog keyed by (path, size, mtime, inode)"""
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, catalog_file: Path, autosave_every: int = 200):
+        """
+        Initialize the catalog
+
         Args:
-            api_key: Anthropic API key
-            cache_dir: Directory for caching journeys
+            catalog_file: JSON file the catalog is persisted to
+            autosave_every: Flush to disk after this many new records
         """
-        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY required")
-        
-        self.client = Anthropic(api_key=self.api_key)
-        self.cache_dir = cache_dir or Path("journeys_cache")
-        self.cache_dir.mkdir(exist_ok=True)
-    
-    def _encode_image(self, image_path: Path) -> tuple[str, str]:
-        """Encode image to base64"""
-        suffix = image_path.suffix.lower()
-        media_type_map = {
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".png": "image/png",
-            ".gif": "image/gif",
-            ".webp": "image/webp"
-        }
-        media_type = media_type_map.get(suffix, "image/jpeg")
-        image_data = base64.standard_b64encode(image_path.read_bytes()).decode("utf-8")
-        return media_type, image_data
-    
-    def _get_cache_key(self, image_path: Path) -> str:
-        """Generate cache key from image content"""
-        return hashlib.md5(image_path.read_bytes()).hexdigest()
-    
-    def create_journey(
-        self, 
-        image_path: Path,
-        use_cache: bool = True
-    ) -> SlowLookingJourney:
+        self.catalog_file = catalog_file
+        self.autosave_every = autosave_every
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        if catalog_file.exists():
+            self._entries = json.loads(catalog_file.read_text()).get("assets", {})
+        else:
+            self._entries = {}
+
+        atexit.register(self.flush)
+
+    def lookup(self, image_path: Path) -> AssetRecord:
         """
-        Create a slow looking journey for an artwork
-        
+        Get the record for an image, hashing it only if it changed
+
         Args:
-            image_path: Path to artwork image
-            use_cache: Whether to use cached journey
-            
+            image_path: Path to the image file
+
         Returns:
-            SlowLookingJourney with complete guided experience
+            AssetRecord with the MD5 digest, dimensions and format
         """
-        
-        # Check cache
-        if use_cache:
-            cache_key = self._get_cache_key(image_path)
-            cache_file = self.cache_dir / f"{cache_key}.json"
-            if cache_file.exists():
-                print(f"✓ Using cached journey for {image_path.name}")
-                data = json.loads(cache_file.read_text())
-                return SlowLookingJourney(**data)
-        
-        print(f"🎨 Creating slow looking journey for {image_path.name}...")
-        
-        # Encode image
-        media_type, image_data = self._encode_image(image_path)
-        
-        # Call Claude API
-        try:
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=8192,
-                temperature=0.7,  # Slightly creative for engaging writing
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": media_type,
-                                    "data": image_data,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": SLOW_LOOKING_PROMPT
-                            }
-                        ],
-                    }
-                ],
-            )
-            
-            # Extract response
-            response_text = response.content[0].text
-            
-            # Parse JSON (handle markdown code blocks)
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
-            
-            journey_data = json.loads(response_text.strip())
-            
-            # Add system fields
-            journey_data["image_filename"] = image_path.name
-            journey_data["created_at"] = datetime.now().isoformat()
-            
-            # Create Pydantic model
-            journey = SlowLookingJourney(**journey_data)
-            
-            # Cache the result
-            cache_key = self._get_cache_key(image_path)
-            cache_file = self.cache_dir / f"{cache_key}.json"
-            cache_file.write_text(journey.model_dump_json(indent=2))
-            
-            print(f"✓ Journey created: {journey.total_steps} steps, "
-                  f"~{journey.estimated_duration_minutes} min "
-                  f"(confidence: {journey.confidence_score:.0%})")
-            
-            return journey
-            
-        except Exception as e:
-            print(f"✗ Error creating journey: {e}")
-            raise
+        key = os.path.abspath(image_path)
+        st = os.stat(key)
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+
+        entry = self._entries.get(key)
+        if entry and entry["stat"] == stamp:
+            return AssetRecord(**entry["record"])
+
+        record = self._scan(image_path)
+
+        with self._lock:
+            self._entries[key] = {"stat": stamp, "record": record.model_dump()}
+            self._unsaved += 1
+            autosave = self._unsaved >= self.autosave_every
+
+        if autosave:
+            self.flush()
+
+        return record
+
+    def perceptual_hash(self, image_path: Path) -> int:
+        """
+        Get the 64-bit difference hash (dHash) of an image, computing it once
+
+        Args:
+            image_path: Path to the image file
+
+        Returns:
+            The hash as an int; visually similar images differ in few bits
+        """
+        record = self.lookup(image_path)
+        if record.dhash is not None:
+            return int(record.dhash, 16)
+
+        value = compute_dhash(image_path)
+        key = os.path.abspath(image_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["record"]["md5"] == record.md5:
+                entry["record"]["dhash"] = f"{value:016x}"
+                self._unsaved += 1
+        return value
+
+    def _scan(self, image_path: Path) -> AssetRecord:
+        """Hash the file in one streaming pass, sniffing the image header on the way"""
+        digest = hashlib.md5()
+        parser = ImageFile.Parser()
+        header = None
+
+        with open(image_path, "rb") as f:
+            while chunk := f.read(self.CHUNK_SIZE):
+                digest.update(chunk)
+                if header is None and parser is not None:
+                    try:
+                        parser.feed(chunk)
+                        header = parser.image
+                    except Exception:
+                        parser = None  # Not an image Pillow understands
+
+        if header is None:
+            return AssetRecord(md5=digest.hexdigest())
+
+        return AssetRecord(
+            md5=digest.hexdigest(),
+            width=header.size[0],
+            height=header.size[1],
+            format=header.format
+        )
+
+    def flush(self):
+        """Write the catalog to disk if anything changed"""
+        with self._lock:
+            if not self._unsaved:
+                return
+            data = json.dumps({"assets": self._entries})
+            self._unsaved = 0
+        _atomic_write_bytes(self.catalog_file, data.encode("utf-8"))
 
 
 # ============================================================================
-# JOURNEY LIBRARY - Save & Retrieve Completed Walkthroughs
+# NEAR-DUPLICATE DETECTION - Perceptual hashes
 # ============================================================================
 
-class JourneyLibrary:
-    """Manage saved slow looking journeys"""
-    
-    def __init__(self, library_dir: Path = Path("user_library")):
-        self.library_dir = library_dir
-        self.library_dir.mkdir(exist_ok=True)
-        self.index_file = library_dir / "_index.json"
-        self._load_index()
-    
-    def _load_index(self):
-        """Load library index"""
-        if self.index_file.exists():
-            self.index = json.loads(self.index_file.read_text())
-        else:
-            self.index = {"journeys": []}
-    
-    def _save_index(self):
-        """Save library index"""
-        self.index_file.write_text(json.dumps(self.index, indent=2))
-    
-    def save_journey(self, journey: SlowLookingJourney, completed_at: Optional[str] = None):
+def compute_dhash(image_path: Path) -> int:
+    """
+    64-bit difference hash: compares neighbouring pixels of a 9x8 thumbnail
+
+    Survives resizing, re-encoding and mild colour changes, so re-exports of
+    the same artwork land within a few bits of each other.
+    """
+    with Image.open(image_path) as img:
+        img.draft("L", (64, 64))
+        small = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class BKTree:
+    """Burkhard-Keller tree for Hamming-distance lookups on 64-bit hashes"""
+
+    def __init__(self):
+        self._root = None  # [hash, [keys], {distance: child}]
+
+    def add(self, value: int, key: str):
+        """Index `key` under hash `value`"""
+        if self._root is None:
+            self._root = [value, [key], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = (node[0] ^ value).bit_count()
+            if distance == 0:
+                if key not in node[1]:
+                    node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[tuple[int, str]]:
         """
-        Save a completed journey to user's library
-        
+        Find indexed keys within `max_distance` bits of `value`
+
+        Returns:
+            (distance, key) pairs, closest first
+        """
+        matches = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            distance = (node[0] ^ value).bit_count()
+            if distance <= max_distance:
+                matches.extend((distance, key) for key in node[1])
+            # Triangle inequality: only children in this band can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches)
+
+
+class PerceptualHashIndex:
+    """Persistent dHash index over journeys_cache entries"""
+
+    def __init__(self, index_file: Path):
+        """
+        Initialize the index
+
         Args:
-            journey: The completed journey
-            completed_at: Timestamp of completion (defaults to now)
+            index_file: JSON file mapping cache keys to dHashes
         """
-        completed_at = completed_at or datetime.now().isoformat()
-        
-        # Save full journey data
-        journey_file = self.library_dir / f"{journey.journey_id}.json"
-        journey_file.write_text(journey.model_dump_json(indent=2))
-        
-        # Update index
-        index_entry = {
-            "journey_id": journey.journey_id,
-            "image_filename": journey.image_filename,
-            "title": journey.artwork.title or "Untitled",
-            "artist": journey.artwork.artist or "Unknown Artist",
-            "completed_at": completed_at,
-            "steps_count": journey.total_steps,
-            "duration_minutes": journey.estimated_duration_minutes
-        }
-        
-        # Check if already in index
-        existing = [j for j in self.index["journeys"] if j["journey_id"] == journey.journey_id]
-        if existing:
-            # Update existing entry
-            for j in self.index["journeys"]:
-                if j["journey_id"] == journey.journey_id:
-                    j.update(index_entry)
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._tree = BKTree()
+
+        if index_file.exists():
+            self._hashes = json.loads(index_file.read_text()).get("hashes", {})
         else:
-            # Add new entry
-            self.index["journeys"].append(index_entry)
-        
-        self._save_index()
-        print(f"✓ Journey saved to library: {journey.artwork.title or 'Untitled'}")
-    
-    def get_journey(self, journey_id: str) -> Optional[SlowLookingJourney]:
-        """Retrieve a saved journey by ID"""
-        journey_file = self.library_dir / f"{journey_id}.json"
-        if not journey_file.exists():
-            return None
-        
-        data = json.loads(journey_file.read_text())
-        return SlowLookingJourney(**data)
-    
-    def list_journeys(self) -> List[dict]:
-        """Get list of all saved journeys"""
-        return sorted(
-            self.index["journeys"], 
-            key=lambda x: x["completed_at"], 
-            reverse=True
-        )
-    
-    def get_stats(self) -> dict:
-        """Get library statistics"""
-        return {
-            "total_journeys": len(self.index["journeys"]),
-            "total_steps": sum(j["steps_count"] for j in self.index["journeys"]),
-            "total_minutes": sum(j["duration_minutes"] for j in self.index["journeys"]),
-        }
+            self._hashes = {}
+        for cache_key, hex_hash in self._hashes.items():
+            self._tree.add(int(hex_hash, 16), cache_key)
+
+        atexit.register(self.flush)
+
+    def __contains__(self, cache_key: str) -> bool:
+        return cache_key in self._hashes
+
+    def add(self, cache_key: str, value: int):
+        """Register the dHash of a cached journey's image"""
+        with self._lock:
+            if cache_key in self._hashes:
+                return
+            self._hashes[cache_key] = f"{value:016x}"
+            self._tree.add(value, cache_key)
+            self._dirty = True
+
+    def find(self, value: int, max_distance: int) -> List[tuple[int, str]]:
+        """Cache keys of images within `max_distance` bits, closest first"""
+        with self._lock:
+            return self._tree.search(value, max_distance)
+
+    def flush(self):
+        """Write the index to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"hashes": self._hashes})
+            self._dirty = False
+        _atomic_write_bytes(self.index_file, data.encode("utf-8"))
 
 
 # ============================================================================
-# BATCH PROCESSOR FOR GALLERY
+# IMAGE PREPARATION
 # ============================================================================
 
-class GalleryPreprocessor:
-    """Pre-process artworks for curated gallery"""
-    
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp"
+}
+
+
+def _sniff_media_type(data: bytes) -> str:
+    """Detect an image's media type from its leading bytes"""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+class ImagePreprocessor:
+    """Downsize and re-encode artwork before upload"""
+
     def __init__(
-        self, 
-        analyzer: SlowLookingAnalyzer, 
-        output_dir: Path = Path("gallery_journeys")
+        self,
+        max_edge: int = 1568,
+        image_format: Literal["JPEG", "WEBP"] = "JPEG",
+        quality: int = 85,
+        cache_dir: Optional[Path] = None
     ):
-        self.analyzer = analyzer
-        self.output_dir = output_dir
-        self.output_dir.mkdir(exist_ok=True)
-    
-    def process_gallery(self, artwork_dir: Path, delay_seconds: float = 2.0):
         """
-        Process all artworks in directory
-        
+        Initialize the preprocessor
+
+        The API scales anything with a long edge over 1568px down anyway, so
+        sending more pixels only costs upload time and memory.
+
         Args:
-            artwork_dir: Directory with artwork images
-            delay_seconds: Delay between API calls
+            max_edge: Longest edge in pixels after resizing
+            image_format: Encoding for the prepared image
+            quality: Encoder quality (1-100)
+            cache_dir: Where prepared payloads are kept (None = no caching)
         """
-        
-        # Find images
-        images = []
-        for ext in ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp"]:
-            images.extend(artwork_dir.glob(ext))
-        
-        if not images:
-            print(f"No images found in {artwork_dir}")
-            return
-        
-        print(f"\n{'='*60}")
-        print(f"Creating {len(images)} slow looking journeys")
-        print(f"{'='*60}\n")
-        
-        results = []
-        
-        for i, image_path in enumerate(images, 1):
-            print(f"\n[{i}/{len(images)}] {image_path.name}")
-            print("-" * 40)
-            
-            try:
-                # Create journey
-                journey = self.analyzer.create_journey(
-                    image_path,
-                    use_cache=True
-                )
-                
-                # Save to gallery
-                output_file = self.output_dir / f"{image_path.stem}.json"
-                output_file.write_text(journey.model_dump_json(indent=2))
-                
-                results.append({
-                    "filename": image_path.name,
-                    "status": "success",
-                    "steps": journey.total_steps,
-                    "duration": journey.estimated_duration_minutes,
-                    "confidence": journey.confidence_score
-                })
-                
-                # Rate limit
-                if i < len(images):
-                    time.sleep(delay_seconds)
-                
-            except Exception as e:
-                print(f"✗ Error: {e}")
-                results.append({
-                    "filename": image_path.name,
-                    "status": "error",
-                    "error": str(e)
-                })
-        
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _cache_file(self, content_hash: str) -> Path:
+        """Prepared payload path; settings are part of the name"""
+        settings = f"{self.max_edge}_{self.image_format.lower()}_{self.quality}"
+        return self.cache_dir / f"{content_hash}_{settings}.{self.image_format.lower()}"
+
+    def prepare(self, image_path: Path, content_hash: str) -> tuple[str, bytes]:
+        """
+        Get the upload payload for an image
+
+        Args:
+            image_path: Path to the original artwork image
+            content_hash: MD5 of the original file (the journey cache key)
+
+        Returns:
+            (media_type, image bytes) ready for base64 encoding
+        """
+        if self.cache_dir:
+            cache_file = self._cache_file(content_hash)
+            if cache_file.exists():
+                data = cache_file.read_bytes()
+                return _sniff_media_type(data), data
+
+        media_type, data = self._reencode(image_path)
+
+        if self.cache_dir:
+            _atomic_write_bytes(self._cache_file(content_hash), data)
+
+        return media_type, data
+
+    def _reencode(self, image_path: Path) -> tuple[str, bytes]:
+        """Resize, drop metadata and re-encode; keeps the original if that's smaller"""
+        with Image.open(image_path) as img:
+            original_size = img.size
+
+            # Let the JPEG decoder skip detail we're about to throw away
+            img.draft("RGB", (self.max_edge, self.max_edge))
+
+            # Bake in camera rotation before the EXIF block is dropped
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+
+            if self.image_format == "JPEG" and img.mode != "RGB":
+                if img.mode in ("RGBA", "LA", "P"):
+                    img = img.convert("RGBA")
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel("A"))
+                    img = background
+                else:
+                    img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if img.mode in ("LA", "P") else "RGB")
+
+            buffer = io.BytesIO()
+            img.save(buffer, format=self.image_format, quality=self.quality, optimize=True)
+            data = buffer.getvalue()
+
+        original_media_type = MEDIA_TYPES.get(image_path.suffix.lower())
+        fits = max(original_size) <= self.max_edge
+        if original_media_type and fits and image_path.stat().st_size <= len(data):
+            return original_media_type, image_path.read_bytes()
+
+        return f"image/{self.image_format.lower()}", data
+
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class TokenBucketRateLimiter:
+    """Thread-safe requests-per-minute / tokens-per-minute budget"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            requests_per_minute: Max API requests per minute (None = unlimited)
+            tokens_per_minute: Max input tokens per minute (None = unlimited)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        # Buckets start full so a run can begin with a burst
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Top up both buckets for the time elapsed since the last refill"""
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60
+        self._last_refill = now
+
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                self.requests_per_minute,
+                self._request_allowance + elapsed_minutes * self.requests_per_minute
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed_minutes * self.tokens_per_minute
+            )
+
+    def acquire(self, tokens: int = 0):
+        """
+        Block until one request costing `tokens` input tokens fits the budget
+
+        Args:
+            tokens: Estimated input tokens for the request
+        """
+        if self.tokens_per_minute:
+            # A single request larger than the whole bucket would never fit
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                wait_seconds = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    missing = 1 - self._request_allowance
+                    wait_seconds = max(wait_seconds, missing / self.requests_per_minute * 60)
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    missing = tokens - self._token_allowance
+                    wait_seconds = max(wait_seconds, missing / self.tokens_per_minute * 60)
+
+                if wait_seconds <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+
+            time.sleep(wait_seconds)
+
+
+class AdaptiveRateController:
+    """
+    Retries, AIMD concurrency control and a circuit breaker for API calls
+
+    Concurrency grows by about one slot per round of successful calls and
+    halves when the API pushes back (429 rate limit, 529 overloaded). Failed
+    calls are retried with jittered exponential backoff, never sooner than
+    the server's retry-after. After `failure_threshold` consecutive failures
+    the circuit opens and every caller waits out a cooldown instead of
+    burning through the queue; one probe call then decides whether to resume.
+    """
+
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+    THROTTLE_STATUS = {429, 529}
+
+    def __init__(
+        self,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        max_retries: int = 6,
+        base_delay_seconds: float = 1.0,
+        max_delay_seconds: float = 60.0,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 60.0,
+        max_cooldown_seconds: float = 600.0
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            initial_concurrency: Calls allowed in flight at the start
+            min_concurrency: Floor for the in-flight limit
+            max_concurrency: Ceiling for the in-flight limit
+            max_retries: Retries per call before giving up
+            base_delay_seconds: First backoff step
+            max_delay_seconds: Longest backoff between retries
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown_seconds: First pause when the circuit opens
+            max_cooldown_seconds: Longest pause after repeated failed probes
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+
+        self._limit = float(initial_concurrency)
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._last_decrease = 0.0
+        self._paused_until = 0.0  # Set by rate-limit headers
+        self._circuit = "closed"  # closed | open | half_open
+        self._circuit_opens_at = 0.0
+        self._circuit_cooldown = cooldown_seconds
+        self._condition = threading.Condition()
+
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "circuit_opened": 0}
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Calls currently allowed in flight"""
+        return max(self.min_concurrency, int(self._limit))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run an API call under the controller
+
+        Args:
+            fn: Callable making the request; if its result has `headers`,
+                rate-limit headers are read from them
+            *args, **kwargs: Passed to `fn`
+
+        Returns:
+            Whatever `fn` returns
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except (APIStatusError, APIConnectionError) as e:
+                self._release()
+                status = getattr(e, "status_code", None)
+                retryable = status is None or status in self.RETRYABLE_STATUS
+                self._on_failure(e, status, retryable)
+
+                if not retryable or attempt >= self.max_retries:
+                    raise
+
+                delay = self._backoff_delay(e, attempt)
+                print(f"  ↻ API {status or 'connection error'}, retrying in {delay:.1f}s "
+                      f"(limit {self.concurrency_limit} in flight)")
+                time.sleep(delay)
+                attempt += 1
+                with self._condition:
+                    self.stats["retries"] += 1
+                continue
+            except Exception:
+                self._release()
+                raise
+
+            self._release()
+            self._on_success(getattr(result, "headers", None))
+            return result
+
+    def _acquire(self):
+        """Wait for a free slot, an unpaused budget and a closed circuit"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+
+                if self._circuit == "open" and now >= self._circuit_opens_at:
+                    self._circuit = "half_open"
+
+                if self._circuit == "open":
+                    wait = self._circuit_opens_at - now
+                elif self._paused_until > now:
+                    wait = self._paused_until - now
+                elif self._circuit == "half_open" and self._in_flight > 0:
+                    wait = None  # Only the probe call may run
+                elif self._in_flight >= self.concurrency_limit:
+                    wait = None
+                else:
+                    self._in_flight += 1
+                    self.stats["calls"] += 1
+                    return
+
+                self._condition.wait(timeout=wait)
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_success(self, headers):
+        """Additive increase, closing the circuit, and header-driven pauses"""
+        with self._condition:
+            self._consecutive_failures = 0
+            if self._circuit != "closed":
+                print("  ▶ API recovered, resuming")
+                self._circuit = "closed"
+                self._circuit_cooldown = self.cooldown_seconds
+
+            remaining = self._header_number(headers, "anthropic-ratelimit-requests-remaining")
+            if remaining is not None and remaining <= 0:
+                # Out of requests for this window: hold until it resets
+                reset = self._header_reset_seconds(headers, "anthropic-ratelimit-requests-reset")
+                if reset:
+                    self._paused_until = max(self._paused_until, time.monotonic() + reset)
+            elif remaining is None or remaining > self._in_flight:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+
+            self._condition.notify_all()
+
+    def _on_failure(self, error, status: Optional[int], retryable: bool):
+        """Multiplicative decrease on pushback; open the circuit on repeated failures"""
+        if not retryable:
+            return
+
+        with self._condition:
+            now = time.monotonic()
+            self._consecutive_failures += 1
+
+            # One decrease per backoff step, not one per concurrent failure
+            if status in self.THROTTLE_STATUS:
+                self.stats["throttled"] += 1
+                if now - self._last_decrease >= self.base_delay_seconds:
+                    self._limit = max(self.min_concurrency, self._limit / 2)
+                    self._last_decrease = now
+
+            if self._circuit == "half_open" or (
+                self._circuit == "closed"
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                if self._circuit == "half_open":
+                    self._circuit_cooldown = min(
+                        self.max_cooldown_seconds, self._circuit_cooldown * 2
+                    )
+                self._circuit = "open"
+                self._circuit_opens_at = now + self._circuit_cooldown
+                self.stats["circuit_opened"] += 1
+                print(f"  ⏸ {self._consecutive_failures} failures in a row, "
+                      f"pausing for {self._circuit_cooldown:.0f}s")
+
+            self._condition.notify_all()
+
+    def _backoff_delay(self, error, attempt: int) -> float:
+        """Full-jitter exponential backoff, at least the server's retry-after"""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+
+        response = getattr(error, "response", None)
+        retry_after = self._header_number(getattr(response, "headers", None), "retry-after")
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def _header_number(headers, name: str) -> Optional[float]:
+        if not headers or headers.get(name) is None:
+            return None
+        try:
+            return float(headers.get(name))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _header_reset_seconds(headers, name: str) -> Optional[float]:
+        """Seconds until an RFC 3339 reset timestamp"""
+        if not headers or not headers.get(name):
+            return None
+        try:
+            reset_at = datetime.fromisoformat(headers.get(name).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return max(0.0, (reset_at - datetime.now(reset_at.tzinfo)).total_seconds())
+
+
+# ============================================================================
+# STRUCTURED OUTPUT - Tool schema & local repair
+# ============================================================================
+
+JOURNEY_TOOL_NAME = "record_slow_looking_journey"
+
+# Filled in by the analyzer after parsing, so the model never has to
+SYSTEM_FIELDS = ("image_filename", "created_at")
+
+
+def journey_tool_definition() -> dict:
+    """Tool definition that forces the reply into the SlowLookingJourney schema"""
+    schema = SlowLookingJourney.model_json_schema()
+    for name in SYSTEM_FIELDS:
+        schema["properties"].pop(name, None)
+    schema["required"] = [r for r in schema.get("required", []) if r not in SYSTEM_FIELDS]
+
+    return {
+        "name": JOURNEY_TOOL_NAME,
+        "description": "Record the complete slow looking journey for the artwork.",
+        "input_schema": schema,
+    }
+
+
+def _model_class(annotation):
+    """The BaseModel inside an annotation like Model, Optional[Model] or List[Model]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        found = _model_class(arg)
+        if found:
+            return found
+    return None
+
+
+def _shorten(text: str, max_length: int) -> str:
+    """Cut text to max_length at a word boundary, marking the cut"""
+    cut = text[:max_length - 1]
+    if " " in cut[max_length // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(" ,;:-") + "…"
+
+
+def repair_model_data(model_cls, data: dict, fixes: List[str], path: str = "") -> dict:
+    """
+    Fix constraint violations that don't need the model's help
+
+    Over-long strings are shortened, out-of-range numbers are clamped and
+    over-long lists are trimmed. Anything else (missing fields, too-short
+    text, unknown tags) is left for validation to reject.
+
+    Args:
+        model_cls: Pydantic model the data should satisfy
+        data: Raw field values (not modified)
+        fixes: Descriptions of applied repairs are appended here
+        path: Field path prefix for the descriptions
+
+    Returns:
+        A repaired copy of `data`
+    """
+    if not isinstance(data, dict):
+        return data
+
+    data = dict(data)
+    for name, field in model_cls.model_fields.items():
+        if name not in data or data[name] is None:
+            continue
+
+        value = data[name]
+        where = f"{path}{name}"
+
+        for constraint in field.metadata:
+            max_length = getattr(constraint, "max_length", None)
+            ge = getattr(constraint, "ge", None)
+            le = getattr(constraint, "le", None)
+
+            if max_length is not None and isinstance(value, str) and len(value) > max_length:
+                value = _shorten(value, max_length)
+                fixes.append(f"shortened {where}")
+            elif max_length is not None and isinstance(value, list) and len(value) > max_length:
+                value = value[:max_length]
+                fixes.append(f"trimmed {where} to {max_length}")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if ge is not None and value < ge:
+                    value = ge
+                    fixes.append(f"raised {where} to {ge}")
+                elif le is not None and value > le:
+                    value = le
+                    fixes.append(f"lowered {where} to {le}")
+
+        if field.annotation is int and isinstance(value, float) and not value.is_integer():
+            value = round(value)
+            fixes.append(f"rounded {where}")
+
+        nested = _model_class(field.annotation)
+        if nested and isinstance(value, list):
+            value = [
+                repair_model_data(nested, item, fixes, f"{where}[{i}].")
+                for i, item in enumerate(value)
+            ]
+        elif nested and isinstance(value, dict):
+            value = repair_model_data(nested, value, fixes, f"{where}.")
+
+        data[name] = value
+
+    return data
+
+
+def fix_step_numbering(data: dict, fixes: List[str]) -> dict:
+    """
+    Number steps 1..n in order and make total_steps match them
+
+    Validation alone accepts a reply whose counts disagree, so this runs on
+    every reply, not only ones that failed validation.
+
+    Returns:
+        A fixed copy of `data` (or `data` itself if nothing needed fixing)
+    """
+    steps = data.get("steps")
+    if not isinstance(steps, list):
+        return data
+
+    data = dict(data)
+    data["steps"] = steps = list(steps)
+    for number, step in enumerate(steps, 1):
+        if isinstance(step, dict) and step.get("step_number") != number:
+            steps[number - 1] = {**step, "step_number": number}
+            fixes.append(f"renumbered steps[{number - 1}]")
+    if data.get("total_steps") != len(steps):
+        fixes[:] = [fix for fix in fixes if "total_steps" not in fix]
+        data["total_steps"] = len(steps)
+        fixes.append("set total_steps to match steps")
+
+    return data
+
+
+def repair_journey_data(data: dict) -> tuple[dict, List[str]]:
+    """
+    Repair a journey reply locally instead of paying for a new request
+
+    Returns:
+        (repaired data, list of applied fixes)
+    """
+    fixes = []
+    total_steps = data.get("total_steps")
+    data = repair_model_data(SlowLookingJourney, data, fixes)
+    # Count against the original value, not one clamped above
+    data = fix_step_numbering({**data, "total_steps": total_steps}, fixes)
+    return data, fixes
+
+
+def extract_journey_data(message) -> dict:
+    """Pull the journey fields out of a tool call or a JSON text reply"""
+    for block in message.content:
+        if block.type == "tool_use" and block.name == JOURNEY_TOOL_NAME:
+            return dict(block.input)
+
+    response_text = "".join(
+        block.text for block in message.content if block.type == "text"
+    )
+
+    # Parse JSON (handle markdown code blocks)
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0]
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0]
+
+    return json.loads(response_text.strip())
+
+
+def parse_journey_message(
+    message,
+    image_filename: str,
+    created_at: Optional[str] = None,
+    count=None
+) -> SlowLookingJourney:
+    """
+    Turn a Messages API reply into a validated journey, repairing it locally if needed
+
+    Args:
+        message: The reply (anything with `.content` blocks)
+        image_filename: Filled in as the journey's image_filename
+        created_at: Timestamp to record (defaults to now)
+        count: Optional callback, called with "parse_failures",
+            "validation_failures", "repaired_responses" or "unrepairable_responses"
+    """
+    count = count or (lambda stat: None)
+    try:
+        journey_data = extract_journey_data(message)
+    except (ValueError, IndexError) as e:
+        count("parse_failures")
+        raise ValueError(f"Could not parse journey JSON: {e}") from e
+
+    # Add system fields
+    journey_data["image_filename"] = image_filename
+    journey_data["created_at"] = created_at or datetime.now().isoformat()
+
+    # Step numbering and counts aren't checked by the model, so always fix them
+    fixes = []
+    journey_data = fix_step_numbering(journey_data, fixes)
+
+    # Create Pydantic model
+    try:
+        journey = SlowLookingJourney(**journey_data)
+    except ValidationError:
+        count("validation_failures")
+
+        repaired, more_fixes = repair_journey_data(journey_data)
+        fixes += more_fixes
+        try:
+            journey = SlowLookingJourney(**repaired)
+        except ValidationError:
+            count("unrepairable_responses")
+            raise
+
+    if not fixes:
+        return journey
+
+    count("repaired_responses")
+    print(f"  Repaired locally: {', '.join(fixes)}")
+    return journey
+
+
+# ============================================================================
+# STREAMING - Incremental journey parsing
+# ============================================================================
+
+class IncrementalJourneyParser:
+    """
+    Picks complete pieces out of a journey JSON document as it streams in
+
+    Only tracks nesting depth and string state, so each character is looked
+    at once. Emits the artwork metadata, the welcome text and each step as
+    soon as its closing character arrives; everything else waits for the
+    full document. A piece that can't be validated even after local repair
+    is skipped (and counted in `skipped`), leaving the final parse of the
+    whole reply to decide.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.skipped = 0
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None  # (start, end) of the last string at depth 1
+        self._key = None
+        self._value_start = None
+        self._step_start = None
+
+    def feed(self, chunk: str) -> List[tuple[str, object]]:
+        """
+        Add streamed text
+
+        Args:
+            chunk: Next piece of the model's reply
+
+        Returns:
+            Completed (event, value) pairs: ("artwork", ArtworkMetadata),
+            ("welcome_text", str) or ("step", WalkthroughStep)
+        """
+        self.text += chunk
+        events = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if not self._started:
+                # Skip any prose or ```json fence before the object
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = (self._string_start, i)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and self._depth == 1:
+                start, end = self._last_string
+                self._key = text[start + 1:end]
+                self._value_start = i + 1
+            elif char in "{[":
+                self._depth += 1
+                if char == "{" and self._depth == 3 and self._key == "steps":
+                    self._step_start = i
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._step_start is not None:
+                    step = self._validate_step(text[self._step_start:i + 1])
+                    if step is not None:
+                        events.append(("step", step))
+                    self._step_start = None
+                elif self._depth == 0:
+                    events.extend(self._top_level_value(text[self._value_start:i]))
+                    self._key = None
+            elif char == "," and self._depth == 1:
+                events.extend(self._top_level_value(text[self._value_start:i]))
+                self._key = None
+
+        self._pos = len(text)
+        return events
+
+    def _validate_step(self, raw: str) -> Optional[WalkthroughStep]:
+        """Validate a streamed step, repairing it locally if needed; None if it can't be"""
+        try:
+            step_data = json.loads(raw)
+            try:
+                return WalkthroughStep(**step_data)
+            except ValidationError:
+                return WalkthroughStep(**repair_model_data(WalkthroughStep, step_data, []))
+        except (ValueError, TypeError):  # ValidationError is a ValueError
+            self.skipped += 1
+            return None
+
+    def _top_level_value(self, raw: str) -> List[tuple[str, object]]:
+        """Events for a finished top-level field"""
+        try:
+            if self._key == "artwork":
+                return [("artwork", ArtworkMetadata(**json.loads(raw)))]
+            if self._key == "welcome_text":
+                return [("welcome_text", json.loads(raw))]
+        except (ValueError, TypeError):
+            self.skipped += 1
+        return []
+
+
+# ============================================================================
+# FULL-TEXT SEARCH - BM25 over journey text
+# ============================================================================
+
+SEARCH_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how in into is it its of on or "
+    "that the their this to was what where which while who why with you your".split()
+)
+
+_SEARCH_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize_search_text(text: str) -> List[str]:
+    """Lowercased word tokens, minus stopwords and single characters"""
+    return [
+        token for token in _SEARCH_TOKEN.findall(text.lower())
+        if len(token) > 1 and token not in SEARCH_STOPWORDS
+    ]
+
+
+def journey_search_text(journey: SlowLookingJourney) -> str:
+    """The searchable text of a journey: artwork, regions and summary"""
+    parts = [value for value in journey.artwork.model_dump().values() if value]
+    for step in journey.steps:
+        region = step.region
+        parts += [region.title, region.observation, region.why_notable, region.soft_prompt]
+    parts += [value for value in journey.final_summary.model_dump().values() if value]
+    return "\n".join(parts)
+
+
+class JourneySearchIndex:
+    """
+    Persistent inverted index with BM25 ranking
+
+    Postings live in SQLite keyed by (term, doc_id), so a query reads only
+    the rows for its own terms. Documents are journeys from either the
+    library or the cache, identified as ("library", journey_id) or
+    ("cache", cache_key); re-adding a document replaces its postings.
+    """
+
+    def __init__(self, index_file: Path = Path("_search_index.sqlite3"), k1: float = 1.2, b: float = 0.75):
+        """
+        Open (or create) the index
+
+        Args:
+            index_file: SQLite database holding the postings
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
+        """
+        self.index_file = index_file
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(index_file), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "doc_id TEXT PRIMARY KEY, source TEXT, key TEXT, journey_id TEXT, "
+                "title TEXT, artist TEXT, length INTEGER)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT, doc_id TEXT, tf INTEGER, length INTEGER, "
+                "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER)"
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO totals VALUES ('documents', 0), ('length', 0)"
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _remove_document(self, doc_id: str):
+        """Drop a document's postings and totals (call inside a transaction)"""
+        row = self._db.execute(
+            "SELECT length FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        self._db.execute("UPDATE totals SET value = value - 1 WHERE name = 'documents'")
+        self._db.execute("UPDATE totals SET value = value - ? WHERE name = 'length'", (row[0],))
+
+    def _add_document(self, source: str, key: str, journey: SlowLookingJourney):
+        """Replace one document's postings (call inside a transaction)"""
+        tokens = tokenize_search_text(journey_search_text(journey))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        doc_id = f"{source}:{key}"
+        self._remove_document(doc_id)
+        self._db.execute(
+            "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, source, key, journey.journey_id,
+             journey.artwork.title, journey.artwork.artist, len(tokens))
+        )
+        self._db.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?, ?)",
+            [(term, doc_id, tf, len(tokens)) for term, tf in counts.items()]
+        )
+        self._db.execute("UPDATE totals SET value = value + 1 WHERE name = 'documents'")
+        self._db.execute("UPDATE totals SET value = value + ? WHERE name = 'length'", (len(tokens),))
+
+    def add(self, source: str, key: str, journey: SlowLookingJourney):
+        """
+        Index (or re-index) one journey
+
+        Args:
+            source: "library" or "cache"
+            key: journey_id for the library, cache key for the cache
+            journey: The journey to index
+        """
+        with self._transaction():
+            self._add_document(source, key, journey)
+
+    def add_many(self, documents: Iterator[tuple[str, str, SlowLookingJourney]], batch_size: int = 500) -> int:
+        """
+        Index many journeys, committing once per batch
+
+        Args:
+            documents: (source, key, journey) tuples
+            batch_size: Journeys per transaction
+
+        Returns:
+            Number of journeys indexed
+        """
+        indexed = 0
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, batch_size))
+            if not batch:
+                return indexed
+            with self._transaction():
+                for source, key, journey in batch:
+                    self._add_document(source, key, journey)
+            indexed += len(batch)
+
+    def remove(self, source: str, key: str):
+        """Remove a journey from the index (no-op if it isn't there)"""
+        with self._transaction():
+            self._remove_document(f"{source}:{key}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT value FROM totals WHERE name = 'documents'"
+            ).fetchone()[0]
+
+    def search(self, query: str, limit: int = 10, source: Optional[str] = None) -> List[dict]:
+        """
+        Rank journeys against a free-text query
+
+        Args:
+            query: Words to look for, e.g. "vanitas symbolism light"
+            limit: Maximum number of results
+            source: Only return "library" or "cache" documents
+
+        Returns:
+            Best matches first, each with source, key, journey_id, title,
+            artist and score
+        """
+        terms = set(tokenize_search_text(query))
+        if not terms or limit < 1:
+            return []
+
+        with self._lock:
+            totals = dict(self._db.execute("SELECT name, value FROM totals"))
+            n_docs = totals["documents"]
+            if not n_docs:
+                return []
+            avg_length = totals["length"] / n_docs
+
+            idf = {}
+            for term in terms:
+                df = self._db.execute(
+                    "SELECT COUNT(*) FROM postings WHERE term = ?", (term,)
+                ).fetchone()[0]
+                if df:
+                    idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            if not idf:
+                return []
+
+            # Score and rank inside SQLite; only the top `limit` rows come back
+            weight = "CASE p.term " + "WHEN ? THEN ? " * len(idf) + "END"
+            params = [value for item in idf.items() for value in item]
+            params += [self.k1 + 1, self.k1, 1 - self.b, self.b / avg_length]
+            params += list(idf)
+            source_filter = "AND p.doc_id >= ? AND p.doc_id < ? " if source else ""
+            params += ([f"{source}:", f"{source};"] if source else []) + [limit]
+            rows = self._db.execute(
+                f"SELECT d.source, d.key, d.journey_id, d.title, d.artist, ranked.score FROM ("
+                f"SELECT p.doc_id, SUM({weight} * p.tf * ? / (p.tf + ? * (? + ? * p.length))) AS score "
+                f"FROM postings p WHERE p.term IN ({', '.join('?' * len(idf))}) {source_filter}"
+                f"GROUP BY p.doc_id ORDER BY score DESC LIMIT ?"
+                f") ranked JOIN documents d ON d.doc_id = ranked.doc_id ORDER BY ranked.score DESC",
+                params
+            ).fetchall()
+
+        fields = ("source", "key", "journey_id", "title", "artist")
+        results = []
+        for row in rows:
+            result = dict(zip(fields, row))
+            result["score"] = round(row[-1], 4)
+            results.append(result)
+        return results
+
+    def rebuild(self, library: Optional["JourneyLibrary"] = None, cache: Optional["JourneyCache"] = None) -> int:
+        """
+        Index everything already in a library and/or cache
+
+        Args:
+            library: Journey library to index
+            cache: Journey cache to index
+
+        Returns:
+            Number of journeys indexed
+        """
+        indexed = 0
+        if library is not None:
+            indexed += self.add_many(
+                ("library", journey.journey_id, journey) for journey in self._library_journeys(library)
+            )
+        if cache is not None:
+            indexed += self.add_many(
+                ("cache", key, journey) for key, journey in self._cached_journeys(cache)
+            )
+        print(f"✓ Indexed {indexed} journeys for search")
+        return indexed
+
+    @staticmethod
+    def _library_journeys(library: "JourneyLibrary") -> Iterator[SlowLookingJourney]:
+        """Every journey saved in a library"""
+        for entry in library.list_journeys():
+            journey = library.get_journey(entry["journey_id"])
+            if journey:
+                yield journey
+
+    @staticmethod
+    def _cached_journeys(cache: "JourneyCache") -> Iterator[tuple[str, SlowLookingJourney]]:
+        """Every readable journey in a cache backend"""
+        for key, _, _ in cache.backend.entries():
+            text = cache.backend.get(key)
+            if text is None:
+                continue
+            try:
+                yield key, load_journey_json(text)
+            except (ValueError, TypeError):
+                continue  # Not a journey (or an unreadable one)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ============================================================================
+# JOURNEY CACHE - In-memory LRU over pluggable persistent backends
+# ============================================================================
+
+class CacheBackend:
+    """Persistent store for cached journey JSON, keyed by image hash"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def put(self, key: str, text: str):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def contains(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def entries(self) -> Iterator[tuple[str, int, float]]:
+        """Yield (key, size in bytes, written-at timestamp) for every entry"""
+        raise NotImplementedError
+
+
+def sharded_path(root: Path, key: str, suffix: str, levels: int = 2, width: int = 2) -> Path:
+    """`root/ab/cd/<key><suffix>` for key "abcd...", so no directory grows too large"""
+    if len(key) < levels * width:
+        return root / f"{key}{suffix}"
+    shards = [key[i * width:(i + 1) * width] for i in range(levels)]
+    return root.joinpath(*shards, f"{key}{suffix}")
+
+
+class DirectoryCacheBackend(CacheBackend):
+    """
+    One JSON file per journey, fanned out by key prefix (`ab/cd/<key>.json`)
+
+    Keeping each directory small avoids the slowdown flat directories hit
+    past a few hundred thousand files. Journeys still in the original flat
+    layout (`<key>.json`) are read, overwritten and deleted transparently,
+    and `migrate_legacy` moves them into shards while the cache is in use.
+    """
+
+    def __init__(self, cache_dir: Path, shard_levels: int = 2, shard_width: int = 2):
+        """
+        Args:
+            cache_dir: Cache root
+            shard_levels: Directory levels under the root (0 = flat layout)
+            shard_width: Key characters per level
+        """
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+
+    def _path(self, key: str) -> Path:
+        return sharded_path(self.cache_dir, key, ".json", self.shard_levels, self.shard_width)
+
+    def _legacy_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            return path.read_text()
+        except FileNotFoundError:
+            pass
+        if path == self._legacy_path(key):
+            return None
+        try:
+            return self._legacy_path(key).read_text()
+        except FileNotFoundError:
+            pass
+        # migrate_legacy may have moved it between the two reads
+        try:
+            return path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write_bytes(path, text.encode("utf-8"))
+        if path != self._legacy_path(key):
+            self._legacy_path(key).unlink(missing_ok=True)  # Stale pre-migration copy
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+        self._legacy_path(key).unlink(missing_ok=True)
+
+    def contains(self, key: str) -> bool:
+        return self._path(key).exists() or self._legacy_path(key).exists()
+
+    def _scan(self, directory: Path, depth: int) -> Iterator[tuple[str, int, float]]:
+        """Journey files in this directory and, down to the shard depth, below it"""
+        try:
+            it = os.scandir(directory)
+        except FileNotFoundError:
+            return  # Shard removed while we were walking
+        with it:
+            for entry in it:
+                if entry.name.startswith(("_", ".")):
+                    continue
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue  # Migrated or deleted since the listing
+                    yield entry.name[:-5], st.st_size, st.st_mtime
+                elif depth < self.shard_levels and len(entry.name) == self.shard_width and entry.is_dir():
+                    yield from self._scan(Path(entry.path), depth + 1)
+
+    def entries(self) -> Iterator[tuple[str, int, float]]:
+        return self._scan(self.cache_dir, 0)
+
+    def legacy_keys(self) -> Iterator[str]:
+        """Keys still stored in the flat layout"""
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json") and not entry.name.startswith(("_", ".")):
+                    key = entry.name[:-5]
+                    if self._path(key) != self._legacy_path(key):
+                        yield key
+
+    def migrate_legacy(self, pause_every: int = 1000, pause_seconds: float = 0.0) -> int:
+        """
+        Move flat-layout journeys into their shards, safe to run while the
+        cache is serving reads and writes
+
+        A journey is hard-linked into place, which never replaces a newer
+        copy written since, and only then unlinked from the root.
+
+        Args:
+            pause_every: Sleep after this many moves, to limit I/O pressure
+            pause_seconds: How long to sleep
+
+        Returns:
+            Number of journeys moved
+        """
+        moved = 0
+        for key in list(self.legacy_keys()):
+            legacy, target = self._legacy_path(key), self._path(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(legacy, target)
+            except FileExistsError:
+                pass  # Rewritten in the new layout already; the flat copy is stale
+            except FileNotFoundError:
+                continue  # Deleted or migrated by someone else
+            except OSError:
+                # No hard links on this filesystem; a rename can't refuse to
+                # overwrite, so check first (a racing put can still lose here)
+                if not target.exists():
+                    try:
+                        os.replace(legacy, target)
+                    except FileNotFoundError:
+                        continue
+            legacy.unlink(missing_ok=True)
+            moved += 1
+            if pause_seconds and moved % pause_every == 0:
+                time.sleep(pause_seconds)
+        return moved
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """All journeys in one SQLite database"""
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journeys ("
+            "key TEXT PRIMARY KEY, data TEXT NOT NULL, "
+            "size INTEGER NOT NULL, written_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM journeys WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO journeys (key, data, size, written_at) VALUES (?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), time.time())
+            )
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM journeys WHERE key = ?", (key,))
+            self._db.commit()
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM journeys WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def entries(self) -> Iterator[tuple[str, int, float]]:
+        with self._lock:
+            rows = self._db.execute("SELECT key, size, written_at FROM journeys").fetchall()
+        yield from rows
+
+
+class DBMCacheBackend(CacheBackend):
+    """
+    Journeys in a dbm key-value file
+
+    Single-file where gdbm/ndbm are available; falls back to dbm.dumb's
+    data + directory file pair otherwise.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = dbm.open(str(db_path), "c")
+
+    def _read(self, key: str) -> Optional[tuple[float, str]]:
+        raw = self._db.get(key.encode("utf-8"))
+        if raw is None:
+            return None
+        written_at, _, text = raw.decode("utf-8").partition("\n")
+        return float(written_at), text
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._read(key)
+        return entry[1] if entry else None
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._db[key.encode("utf-8")] = f"{time.time()}\n{text}".encode("utf-8")
+
+    def delete(self, key: str):
+        with self._lock:
+            try:
+                del self._db[key.encode("utf-8")]
+            except KeyError:
+                pass
+
+    def entries(self) -> Iterator[tuple[str, int, float]]:
+        with self._lock:
+            keys = list(self._db.keys())
+            rows = []
+            for raw_key in keys:
+                key = raw_key.decode("utf-8")
+                entry = self._read(key)
+                if entry:
+                    rows.append((key, len(entry[1]), entry[0]))
+        yield from rows
+
+
+# Extra top-level key in cached journey JSON; SlowLookingJourney ignores it
+GENERATION_KEY = "_generation"
+
+
+class _GenerationStamp(BaseModel):
+    generation: Optional[str] = Field(None, alias=GENERATION_KEY)
+
+
+def _read_generation(text: str) -> Optional[str]:
+    """Generation fingerprint of a cached journey's JSON (written first, if at all)"""
+    if not text.startswith(f'{{"{GENERATION_KEY}"'):
+        return None
+    return _GenerationStamp.model_validate_json(text).generation
+
+
+class JourneyCache:
+    """Validated journeys in an in-process LRU in front of a persistent backend"""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        memory_entries: int = 256,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        evict_every: int = 100,
+        search_index: Optional[JourneySearchIndex] = None
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            backend: Where journeys are persisted
+            memory_entries: Journeys kept in memory (0 = no memory tier)
+            max_entries: Evict oldest entries beyond this count
+            max_bytes: Evict oldest entries beyond this total size
+            max_age_days: Evict entries written longer ago than this
+            evict_every: Run eviction after this many writes
+            search_index: Full-text index kept in step with writes and evictions
+        """
+        self.backend = backend
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.evict_every = evict_every
+        self.search_index = search_index
+
+        self._memory = OrderedDict()  # key -> (journey.model_dump(), generation)
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _remember(self, key: str, journey: SlowLookingJourney, generation: Optional[str]):
+        """
+        Insert into the LRU, dropping the least recently used entry if full
+
+        Kept as plain data rather than the model, so every hit validates a
+        journey of its own and callers can't change what others get.
+        """
+        if not self.memory_entries:
+            return
+        entry = (journey.model_dump(), generation)
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[SlowLookingJourney]:
+        """
+        Look up a journey
+
+        Args:
+            key: Cache key (MD5 of the image)
+
+        Returns:
+            The journey, or None on a miss
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[tuple[SlowLookingJourney, Optional[str]]]:
+        """
+        Look up a journey along with the generation fingerprint it was stored with
+
+        Returns:
+            (journey, generation), or None on a miss; generation is None for
+            entries written before fingerprints were recorded. The journey is
+            the caller's own copy.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        if entry is not None:
+            data, generation = entry
+            return SlowLookingJourney.model_validate(data), generation
+
+        text = self.backend.get(key)
+        if text is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        entry = (load_journey_json(text), _read_generation(text))
+        self._remember(key, *entry)
+        with self._lock:
+            self.stats["disk_hits"] += 1
+        return entry
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.backend.contains(key)
+
+    def generation_of(self, key: str) -> Optional[str]:
+        """Generation fingerprint of a cached journey, without validating the journey"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return entry[1]
+
+        text = self.backend.get(key)
+        return _read_generation(text) if text is not None else None
+
+    def put(self, key: str, journey: SlowLookingJourney, generation: Optional[str] = None):
+        """
+        Store a journey in both tiers
+
+        Args:
+            key: Cache key (MD5 of the image)
+            journey: The journey to store
+            generation: Fingerprint of the prompt/model/schema that produced it
+        """
+        text = journey.model_dump_json(indent=2)
+        if generation is not None:
+            text = f'{{"{GENERATION_KEY}": {json.dumps(generation)},{text[1:]}'
+        self.backend.put(key, text)
+        self._remember(key, journey, generation)
+        if self.search_index is not None:
+            self.search_index.add("cache", key, journey)
+
+        with self._lock:
+            self._writes_since_eviction += 1
+            due = self._writes_since_eviction >= self.evict_every
+            if due:
+                self._writes_since_eviction = 0
+        if due:
+            self.evict()
+
+    def delete(self, key: str):
+        """Remove a journey from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        self.backend.delete(key)
+        if self.search_index is not None:
+            self.search_index.remove("cache", key)
+
+    def evict(self) -> int:
+        """
+        Apply the size and age limits, oldest entries first
+
+        Returns:
+            Number of entries removed
+        """
+        if not (self.max_entries or self.max_bytes or self.max_age_days):
+            return 0
+
+        entries = sorted(self.backend.entries(), key=lambda e: e[2])
+        total_bytes = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+
+        removed = 0
+        for key, size, written_at in entries:
+            remaining = len(entries) - removed
+            too_old = cutoff is not None and written_at < cutoff
+            too_many = self.max_entries is not None and remaining > self.max_entries
+            too_big = self.max_bytes is not None and total_bytes > self.max_bytes
+            if not (too_old or too_many or too_big):
+                break  # Sorted by age, so everything after is newer and fits
+
+            self.delete(key)
+            total_bytes -= size
+            removed += 1
+
+        with self._lock:
+            self.stats["evictions"] += removed
+        return removed
+
+
+# ============================================================================
+# REVALIDATION - Background refresh of stale cache entries
+# ============================================================================
+
+def generation_fingerprint(request_template: dict) -> str:
+    """
+    Short hash of everything that shapes a generated journey
+
+    Args:
+        request_template: The Messages API parameters minus the image
+            (prompts, model, sampling parameters, tools)
+
+    Returns:
+        16 hex characters; changes whenever the request or the
+        SlowLookingJourney schema does
+    """
+    blob = json.dumps(
+        {"request": request_template, "schema": SlowLookingJourney.model_json_schema()},
+        sort_keys=True
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class JourneyRevalidator:
+    """
+    Regenerates stale cache entries one at a time on a background thread
+
+    Stale journeys keep being served while they wait, and the refresh rate
+    is capped so a prompt change rolls out gradually instead of as a burst
+    of API calls. At exit, queued refreshes are dropped but one already
+    calling the API is allowed to finish.
+    """
+
+    def __init__(self, regenerate, refreshes_per_minute: float = 6.0, max_pending: int = 1000):
+        """
+        Args:
+            regenerate: Called with an image path to produce and cache a fresh journey
+            refreshes_per_minute: Upper bound on regenerations
+            max_pending: Queue size; further stale hits are skipped until it drains
+        """
+        self.regenerate = regenerate
+        self.limiter = TokenBucketRateLimiter(requests_per_minute=refreshes_per_minute)
+        self.max_pending = max_pending
+
+        self._queue = OrderedDict()  # cache key -> image path, oldest first
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._worker = None
+        self.stats = {"scheduled": 0, "regenerated": 0, "failed": 0, "skipped": 0}
+
+    def schedule(self, cache_key: str, image_path: Path) -> bool:
+        """
+        Queue a stale entry for regeneration (no-op if already queued)
+
+        Returns:
+            True if it was queued now
+        """
+        with self._condition:
+            if self._closed or cache_key in self._queue:
+                return False
+            if len(self._queue) >= self.max_pending:
+                self.stats["skipped"] += 1
+                return False
+            self._queue[cache_key] = image_path
+            self.stats["scheduled"] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="journey-revalidator", daemon=True)
+                self._worker.start()
+                atexit.register(self.close)
+            self._condition.notify()
+            return True
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue) + (1 if self._busy else 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closed)
+                if self._closed:
+                    return
+
+            # Wait for a token before taking the entry, so closing never
+            # waits on the throttle
+            self.limiter.acquire()
+            with self._condition:
+                if self._closed:
+                    return
+                cache_key, image_path = self._queue.popitem(last=False)
+                self._busy = True
+
+            try:
+                if image_path.exists():
+                    self.regenerate(image_path)
+                    outcome = "regenerated"
+                else:
+                    outcome = "skipped"  # Image moved; the next hit re-queues it
+            except Exception as e:
+                print(f"⚠️  Background refresh failed for {image_path.name}: {e}")
+                outcome = "failed"
+
+            with self._condition:
+                self.stats[outcome] += 1
+                self._busy = False
+                self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the queue is empty
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._busy, timeout
+            )
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Drop queued refreshes and wait for the one in progress, if any
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._condition:
+            self._closed = True
+            self.stats["skipped"] += len(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._busy, timeout)
+
+
+# ============================================================================
+# RESPONSE ARCHIVE - Raw replies kept for offline re-parsing
+# ============================================================================
+
+def _content_block_record(block) -> dict:
+    """JSON-safe copy of one reply content block"""
+    if block.type == "text":
+        return {"type": "text", "text": block.text}
+    if block.type == "tool_use":
+        return {"type": "tool_use", "name": block.name, "input": block.input}
+    return {"type": block.type}
+
+
+class ResponseArchive:
+    """
+    Compressed raw API replies, content-addressed by request fingerprint
+
+    Each reply is stored verbatim with its usage, so journeys can be rebuilt
+    after a parser or schema fix without paying for the calls again. Files
+    are gzipped JSON under `<fp[:2]>/<fp>.json.gz`.
+    """
+
+    def __init__(self, archive_dir: Path):
+        self.archive_dir = archive_dir
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.archive_dir / fingerprint[:2] / f"{fingerprint}.json.gz"
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return self._path(fingerprint).exists()
+
+    def put(self, fingerprint: str, message, **metadata):
+        """
+        Archive one reply
+
+        Args:
+            fingerprint: Request fingerprint (see SlowLookingAnalyzer.request_fingerprint)
+            message: The Messages API reply
+            **metadata: Extra fields to keep with it (cache key, image name, ...)
+        """
+        usage = message.usage
+        record = {
+            "fingerprint": fingerprint,
+            "archived_at": datetime.now().isoformat(),
+            **metadata,
+            "model": getattr(message, "model", None),
+            "stop_reason": getattr(message, "stop_reason", None),
+            "usage": {
+                name: getattr(usage, name, 0) or 0
+                for name in ("input_tokens", "output_tokens",
+                             "cache_creation_input_tokens", "cache_read_input_tokens")
+            },
+            "content": [_content_block_record(block) for block in message.content],
+        }
+        path = self._path(fingerprint)
+        path.parent.mkdir(exist_ok=True)
+        _atomic_write_bytes(path, gzip.compress(json.dumps(record).encode("utf-8"), 6))
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        """The archived record, or None"""
+        try:
+            return json.loads(gzip.decompress(self._path(fingerprint).read_bytes()))
+        except FileNotFoundError:
+            return None
+
+    def files(self) -> Iterator[Path]:
+        """Every archived reply file"""
+        return self.archive_dir.glob("*/*.json.gz")
+
+
+def _message_from_record(record: dict):
+    """Rebuild a reply-like object that parse_journey_message accepts"""
+    return SimpleNamespace(content=[SimpleNamespace(**block) for block in record["content"]])
+
+
+def _reparse_response_file(path: Path) -> dict:
+    """Re-parse one archived reply (runs in a worker process)"""
+    record = json.loads(gzip.decompress(path.read_bytes()))
+    outcome = {"cache_key": record.get("cache_key"), "generation": record.get("generation"),
+               "image_filename": record.get("image_filename"), "stats": {}}
+
+    def count(stat):
+        outcome["stats"][stat] = outcome["stats"].get(stat, 0) + 1
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            journey = parse_journey_message(
+                _message_from_record(record),
+                record.get("image_filename") or "",
+                created_at=record.get("archived_at"),
+                count=count
+            )
+        outcome["journey"] = journey.model_dump_json()
+    except (ValueError, TypeError) as e:
+        outcome["error"] = str(e).splitlines()[0]
+    return outcome
+
+
+def reparse_response_archive(
+    archive: ResponseArchive,
+    cache: JourneyCache,
+    generation: Optional[str] = None,
+    max_workers: Optional[int] = None
+) -> dict:
+    """
+    Rebuild cached journeys from archived replies, with no API calls
+
+    Args:
+        archive: Archived replies to re-parse
+        cache: Where rebuilt journeys are written (replacing existing entries)
+        generation: Fingerprint to store them under (default: the one each
+            reply was generated with)
+        max_workers: Parser processes (default: one per core)
+
+    Returns:
+        Counts of rebuilt, failed, repaired and skipped replies
+    """
+    files = sorted(archive.files())
+    summary = {"replies": len(files), "rebuilt": 0, "failed": 0, "repaired": 0, "skipped": 0}
+    print(f"🔁 Re-parsing {len(files)} archived replies...")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for outcome in pool.map(_reparse_response_file, files, chunksize=32):
+            if not outcome["cache_key"]:
+                summary["skipped"] += 1
+            elif "journey" in outcome:
+                cache.put(outcome["cache_key"], load_journey_json(outcome["journey"]),
+                          generation or outcome["generation"])
+                summary["rebuilt"] += 1
+                summary["repaired"] += outcome["stats"].get("repaired_responses", 0)
+            else:
+                summary["failed"] += 1
+                print(f"✗ {outcome['image_filename']}: {outcome['error']}")
+
+    print(f"✓ Rebuilt {summary['rebuilt']} journeys "
+          f"({summary['repaired']} repaired, {summary['failed']} failed) with no API calls")
+    return summary
+
+
+# ============================================================================
+# JOURNEY ARCHIVE - Compact encodings & packed files
+# ============================================================================
+
+# Compressed JSON is the default: on journeys it comes out no larger than
+# compressed MessagePack (zlib folds the repeated field names) and decodes faster
+JOURNEY_CODECS = ("json", "json+zlib", "msgpack+zlib")
+
+
+def encode_journey(journey: SlowLookingJourney, codec: str = "json+zlib") -> bytes:
+    """
+    Serialize a journey compactly
+
+    Args:
+        journey: The journey to encode
+        codec: "json" (no whitespace), "json+zlib" or "msgpack+zlib"
+    """
+    if codec == "json":
+        return journey.model_dump_json().encode("utf-8")
+    if codec == "json+zlib":
+        return zlib.compress(journey.model_dump_json().encode("utf-8"), 9)
+    if codec == "msgpack+zlib":
+        if msgpack is None:
+            raise ValueError("msgpack+zlib needs the msgpack package (pip install msgpack)")
+        return zlib.compress(msgpack.packb(journey.model_dump(mode="json")), 9)
+    raise ValueError(f"Unknown journey codec: {codec}")
+
+
+def decode_journey(data: bytes, codec: str = "json+zlib") -> SlowLookingJourney:
+    """Inverse of encode_journey; accepts any bytes-like object (e.g. an mmap slice)"""
+    if codec == "json":
+        return load_journey_json(bytes(data))
+    if codec == "json+zlib":
+        return load_journey_json(zlib.decompress(data))
+    if codec == "msgpack+zlib":
+        if msgpack is None:
+            raise ValueError("msgpack+zlib needs the msgpack package (pip install msgpack)")
+        return SlowLookingJourney.model_validate(msgpack.unpackb(zlib.decompress(data)))
+    raise ValueError(f"Unknown journey codec: {codec}")
+
+
+class JourneyArchive:
+    """
+    Many journeys packed into one memory-mapped file
+
+    Layout: a fixed header, the encoded journeys back to back, then an
+    index of fixed-width entries sorted by key followed by a pool of key
+    bytes. Lookups binary-search the index straight out of the mapping,
+    so opening an archive costs nothing however many journeys it holds,
+    and `get_bytes` hands back a zero-copy view of the stored record.
+    """
+
+    MAGIC = b"SLJARCH1"
+    HEADER = struct.Struct("<8s16sQQ")    # magic, codec, count, index offset
+    ENTRY = struct.Struct("<QIIH")         # data offset, data length, key offset, key length
+
+    def __init__(self, archive_file: Path):
+        self.archive_file = archive_file
+        self._file = open(archive_file, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty archive file: {archive_file}")
+
+        magic, codec, self._count, index_offset = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"Not a journey archive: {archive_file}")
+        self.codec = codec.rstrip(b"\0").decode("ascii")
+        self._index_offset = index_offset
+        self._pool_offset = index_offset + self._count * self.ENTRY.size
+        self._view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> tuple[int, int, bytes]:
+        """(data offset, data length, key) of the position-th index entry"""
+        data_offset, data_length, key_offset, key_length = self.ENTRY.unpack_from(
+            self._map, self._index_offset + position * self.ENTRY.size
+        )
+        start = self._pool_offset + key_offset
+        return data_offset, data_length, self._map[start:start + key_length]
+
+    def _find(self, key: str) -> Optional[tuple[int, int]]:
+        """Binary search for a key's record"""
+        target = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            data_offset, data_length, found = self._entry(middle)
+            if found == target:
+                return data_offset, data_length
+            if found < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def keys(self) -> Iterator[str]:
+        """Keys in sorted order"""
+        for position in range(self._count):
+            yield self._entry(position)[2].decode("utf-8")
+
+    def get_bytes(self, key: str) -> Optional[memoryview]:
+        """
+        The encoded record for a key, as a view into the mapping
+
+        Copy it (bytes(view)) to keep the data beyond the archive's lifetime;
+        the view itself keeps the mapping alive until released.
+        """
+        found = self._find(key)
+        if found is None:
+            return None
+        data_offset, data_length = found
+        return self._view[data_offset:data_offset + data_length]
+
+    def get(self, key: str) -> Optional[SlowLookingJourney]:
+        """Decode one journey, or None if the key isn't in the archive"""
+        data = self.get_bytes(key)
+        return decode_journey(data, self.codec) if data is not None else None
+
+    def items(self) -> Iterator[tuple[str, SlowLookingJourney]]:
+        """Every (key, journey), in key order"""
+        for position in range(self._count):
+            data_offset, data_length, key = self._entry(position)
+            data = self._view[data_offset:data_offset + data_length]
+            yield key.decode("utf-8"), decode_journey(data, self.codec)
+
+    def close(self):
+        """
+        Unmap the archive, unless views from get_bytes are still alive
+
+        In that case the mapping stays valid for them and is unmapped
+        once the last one is released or garbage-collected.
+        """
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+                self._view = None
+            if not self._map.closed:
+                self._map.close()
+        except BufferError:
+            pass  # Outstanding views; the mapping goes when they do
+        finally:
+            self._file.close()
+
+    @classmethod
+    def write(
+        cls,
+        archive_file: Path,
+        journeys: Iterator[tuple[str, SlowLookingJourney]],
+        codec: str = "json+zlib"
+    ) -> int:
+        """
+        Pack journeys into a new archive (replacing any existing file atomically)
+
+        Args:
+            archive_file: Where to write the archive
+            journeys: (key, journey) pairs; later duplicates of a key win
+            codec: Record encoding (see JOURNEY_CODECS)
+
+        Returns:
+            Number of journeys written
+        """
+        if codec not in JOURNEY_CODECS:
+            raise ValueError(f"Unknown journey codec: {codec}")
+
+        tmp_file = archive_file.with_name(f".{archive_file.name}.{uuid.uuid4().hex}.tmp")
+        records = {}
+        try:
+            with open(tmp_file, "wb") as out:
+                out.write(b"\0" * cls.HEADER.size)
+                offset = cls.HEADER.size
+                for key, journey in journeys:
+                    data = encode_journey(journey, codec)
+                    out.write(data)
+                    records[key.encode("utf-8")] = (offset, len(data))
+                    offset += len(data)
+
+                index_offset = offset
+                pool = bytearray()
+                for key in sorted(records):
+                    data_offset, data_length = records[key]
+                    out.write(cls.ENTRY.pack(data_offset, data_length, len(pool), len(key)))
+                    pool += key
+                out.write(pool)
+
+                out.seek(0)
+                out.write(cls.HEADER.pack(cls.MAGIC, codec.encode("ascii"), len(records), index_offset))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_file, archive_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+        return len(records)
+
+
+def _journey_files(journey_dir: Path) -> Iterator[tuple[str, SlowLookingJourney]]:
+    """(file stem, journey) for every journey JSON in a directory or its shards"""
+    for journey_file in sorted(journey_dir.rglob("*.json")):
+        if journey_file.name.startswith(("_", ".")):
+            continue  # Indexes, catalogs and reports, not journeys
+        try:
+            yield journey_file.stem, load_journey_json(journey_file.read_bytes())
+        except ValidationError as e:
+            print(f"⚠️  Skipping {journey_file.name}: not a valid journey ({e.error_count()} errors)")
+
+
+def pack_journey_dir(journey_dir: Path, archive_file: Path, codec: str = "json+zlib") -> int:
+    """
+    Convert a directory of journey JSON files (cache, library or gallery
+    output) into one archive, keyed by file name without `.json`
+
+    Returns:
+        Number of journeys packed
+    """
+    count = JourneyArchive.write(archive_file, _journey_files(journey_dir), codec)
+    print(f"✓ Packed {count} journeys into {archive_file}")
+    return count
+
+
+def unpack_journey_archive(archive_file: Path, journey_dir: Path, indent: Optional[int] = 2) -> int:
+    """
+    Convert an archive back into one `<key>.json` file per journey
+
+    Returns:
+        Number of journeys written
+    """
+    journey_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with JourneyArchive(archive_file) as archive:
+        for key, journey in archive.items():
+            _atomic_write_bytes(journey_dir / f"{key}.json", journey.model_dump_json(indent=indent).encode("utf-8"))
+            count += 1
+    print(f"✓ Unpacked {count} journeys into {journey_dir}")
+    return count
+
+
+# ============================================================================
+# JOURNEY ANALYZER
+# ============================================================================
+
+class SlowLookingAnalyzer:
+    """Creates guided slow looking journeys through artworks"""
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache_dir: Optional[Path] = None,
+        rate_limiter: Optional[TokenBucketRateLimiter] = None,
+        base_url: Optional[str] = None,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
+        near_duplicate_distance: Optional[int] = None,
+        structured_output: bool = False,
+        rate_controller: Optional[AdaptiveRateController] = None,
+        cache: Optional[JourneyCache] = None,
+        refreshes_per_minute: Optional[float] = None,
+        archive_responses: bool = False
+    ):
+        """
+        Initialize the analyzer
+
+        Args:
+            api_key: Anthropic API key
+            cache_dir: Directory for caching journeys
+            rate_limiter: Optional shared budget applied before each API call
+            base_url: Override the API endpoint (e.g. a local stub server)
+            image_preprocessor: Downsizes images before upload (None = send as-is)
+            near_duplicate_distance: Max dHash bit difference for reusing the
+                journey of a visually identical image, e.g. 5 to catch
+                re-encoded or resized copies (None = exact matches only).
+                Off by default: series works and colour variants can fall
+                within a few bits of each other
+            structured_output: Force the reply through a tool whose input
+                schema is SlowLookingJourney instead of parsing free text
+            rate_controller: Retries, adapts concurrency and pauses on
+                outages for create_journey calls (None = SDK retries only)
+            cache: Journey cache (default: LRU over sharded files in cache_dir)
+            refreshes_per_minute: Rate at which journeys cached under an older
+                prompt/model/schema are regenerated in the background while
+                still being served (None = serve them without regenerating;
+                the default, so read-only uses never spend API calls)
+            archive_responses: Keep every raw reply in cache_dir/_responses so
+                journeys can be re-parsed offline (see reparse_response_archive).
+                Off by default: the archive is never evicted, so it grows
+                by one file per API call
+        """
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY required")
+
+        self.client = Anthropic(api_key=self.api_key, base_url=base_url)
+        self.cache_dir = cache_dir or Path("journeys_cache")
+        self.cache_dir.mkdir(exist_ok=True)
+        self.cache = cache or JourneyCache(DirectoryCacheBackend(self.cache_dir))
+        self.rate_limiter = rate_limiter
+        self.image_preprocessor = image_preprocessor
+        self.asset_catalog = AssetCatalog(self.cache_dir / "_asset_catalog.json")
+        self.near_duplicate_distance = near_duplicate_distance
+        self.structured_output = structured_output
+        self.rate_controller = rate_controller
+        self.phash_index = PerceptualHashIndex(self.cache_dir / "_phash_index.json")
+        self._in_flight = SingleFlight()
+        self._lock_dir = self.cache_dir / "_locks"  # Lock files per generated key, sharded like the cache
+        self.response_archive = ResponseArchive(self.cache_dir / "_responses") if archive_responses else None
+
+        # Cache entries from a different prompt/model/schema are stale
+        self.generation = generation_fingerprint(self._request_template())
+        self.revalidator = None
+        if refreshes_per_minute:
+            self.revalidator = JourneyRevalidator(
+                self.refresh_journey,
+                refreshes_per_minute=refreshes_per_minute
+            )
+
+        # How each create_journey call was answered
+        self.stats = {"api_calls": 0, "cache_hits": 0, "near_duplicate_hits": 0, "coalesced": 0}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _count(self, stat: str, amount: int = 1):
+        """Increment a usage counter"""
+        with self._stats_lock:
+            self.stats[stat] = self.stats.get(stat, 0) + amount
+
+    def estimate_request_tokens(self, image_path: Path) -> int:
+        """
+        Rough input-token estimate for one journey request
+
+        Images cost about (width * height) / 750 tokens after the API scales
+        them to fit ~1.15 megapixels; the prompt is ~4 characters per token.
+        """
+        prompt_tokens = len(SLOW_LOOKING_PROMPT) // 4
+        try:
+            record = self.asset_catalog.lookup(image_path)
+        except OSError:
+            record = None
+        if not record or not record.width or not record.height:
+            return prompt_tokens + 1600
+
+        width, height = record.width, record.height
+        scale = min(1.0, (1_150_000 / (width * height)) ** 0.5)
+        return prompt_tokens + int(width * height * scale * scale / 750)
+
+    def _load_image_payload(self, image_path: Path, cache_key: Optional[str] = None) -> tuple[str, bytes]:
+        """Image bytes to upload, downsized first if a preprocessor is set"""
+        if self.image_preprocessor:
+            return self.image_preprocessor.prepare(
+                image_path,
+                cache_key or self._get_cache_key(image_path)
+            )
+        return MEDIA_TYPES.get(image_path.suffix.lower(), "image/jpeg"), image_path.read_bytes()
+
+    def _encode_image(
+        self,
+        image_path: Path,
+        cache_key: Optional[str] = None,
+        payload: Optional[tuple[str, bytes]] = None
+    ) -> tuple[str, str]:
+        """Encode image to base64, downsizing it first if a preprocessor is set"""
+        media_type, raw = payload or self._load_image_payload(image_path, cache_key)
+        image_data = base64.standard_b64encode(raw).decode("utf-8")
+        return media_type, image_data
+
+    def _get_cache_key(self, image_path: Path) -> str:
+        """Generate cache key from image content (memoized by the asset catalog)"""
+        return self.asset_catalog.lookup(image_path).md5
+
+    def _request_template(self) -> dict:
+        """Messages API parameters shared by every artwork (all but the image)"""
+        params = {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 8192,
+            "temperature": 0.7,  # Slightly creative for engaging writing
+            # Static instructions first, so every artwork shares the cached prefix
+            "system": [
+                {
+                    "type": "text",
+                    "text": SLOW_LOOKING_PROMPT,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": JOURNEY_REQUEST_TEXT
+                        }
+                    ],
+                }
+            ],
+        }
+
+        if self.structured_output:
+            params["tools"] = [journey_tool_definition()]
+            params["tool_choice"] = {"type": "tool", "name": JOURNEY_TOOL_NAME}
+
+        return params
+
+    def _build_message_params(
+        self,
+        image_path: Path,
+        cache_key: Optional[str] = None,
+        payload: Optional[tuple[str, bytes]] = None
+    ) -> dict:
+        """Build the Messages API parameters for one artwork (from `payload` if already loaded)"""
+        media_type, image_data = self._encode_image(image_path, cache_key, payload)
+        params = self._request_template()
+        params["messages"][0]["content"].insert(0, {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": image_data,
+            },
+        })
+        return params
+
+    def request_fingerprint(self, cache_key: str) -> str:
+        """
+        Identity of the request this analyzer sends for an image
+
+        Covers the image bytes, how they're prepared for upload and the
+        generation fingerprint, without needing the encoded image itself.
+        """
+        preprocessor = self.image_preprocessor
+        parts = {
+            "generation": self.generation,
+            "image": cache_key,
+            "preprocess": [preprocessor.max_edge, preprocessor.image_format, preprocessor.quality]
+            if preprocessor else None,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _archive_response(self, cache_key: str, image_path: Path, message):
+        """Keep a raw reply before it is parsed, so it is never paid for twice"""
+        if not self.response_archive:
+            return
+        try:
+            self.response_archive.put(
+                self.request_fingerprint(cache_key),
+                message,
+                cache_key=cache_key,
+                image_filename=image_path.name,
+                generation=self.generation
+            )
+        except OSError as e:
+            print(f"⚠️  Could not archive reply for {image_path.name}: {e}")
+
+    def _call_api(self, params: dict, image_path: Path, cache_key: str):
+        """Wait for budget, send one request, then archive the reply and count its tokens"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self.estimate_request_tokens(image_path))
+
+        self._count("api_calls")
+        response = self._send_request(params)
+        self._archive_response(cache_key, image_path, response)
+        self._record_usage(response.usage)
+        return response
+
+    def _send_request(self, params: dict):
+        """Call the Messages API, through the rate controller if one is set"""
+        if not self.rate_controller:
+            return self.client.messages.create(**params)
+
+        # The controller owns retries, so switch off the SDK's own
+        client = self.client.with_options(max_retries=0)
+        raw = self.rate_controller.call(client.messages.with_raw_response.create, **params)
+        return raw.parse()
+
+    def _record_usage(self, usage) -> dict:
+        """
+        Add one response's token usage to the running totals
+
+        Args:
+            usage: `response.usage` from the Messages API
+
+        Returns:
+            Token counts for this call, including prompt-cache reads/writes
+        """
+        call_usage = {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        }
+        for name, count in call_usage.items():
+            self._count(name, count)
+
+        self._local.last_usage = call_usage
+        return call_usage
+
+    @property
+    def last_usage(self) -> Optional[dict]:
+        """Token usage of the most recent API call made by this thread"""
+        return getattr(self._local, "last_usage", None)
+
+    def _parse_journey_response(self, message, image_path: Path) -> SlowLookingJourney:
+        """
+        Turn a Messages API reply into a validated journey
+
+        Constraint violations that can be fixed locally are repaired rather
+        than discarded; parse failures, repairs and unrepairable replies are
+        counted in `stats` so wasted calls can be tracked.
+        """
+        return parse_journey_message(message, image_path.name, count=self._count)
+
+    def _cache_journey(self, cache_key: str, journey: SlowLookingJourney, image_path: Optional[Path] = None):
+        """Write a freshly generated journey to the cache and make it findable by look-alikes"""
+        self.cache.put(cache_key, journey, self.generation)
+
+        if image_path is not None:
+            self._index_perceptual_hash(cache_key, image_path)
+
+    def _index_perceptual_hash(self, cache_key: str, image_path: Path):
+        """Add an image's dHash to the near-duplicate index"""
+        if self.near_duplicate_distance is None or cache_key in self.phash_index:
+            return
+        try:
+            self.phash_index.add(cache_key, self.asset_catalog.perceptual_hash(image_path))
+        except Exception:
+            pass  # Not decodable; exact-hash caching still works
+
+    def _revalidate_if_stale(self, cache_key: str, image_path: Path, generation: Optional[str]):
+        """Queue a background regeneration for a journey from an older prompt/model/schema"""
+        if generation == self.generation:
+            return
+        self._count("stale_hits")
+        if self.revalidator:
+            self.revalidator.schedule(cache_key, image_path)
+
+    def find_cached_journey(self, image_path: Path, cache_key: str) -> Optional[SlowLookingJourney]:
+        """
+        Look up a cached journey for this image or a near-duplicate of it
+
+        Args:
+            image_path: Path to artwork image
+            cache_key: MD5 of the image file
+
+        Returns:
+            The cached journey, or None if a new one has to be generated
+        """
+        entry = self.cache.get_entry(cache_key)
+        if entry is not None:
+            cached, generation = entry
+            print(f"✓ Using cached journey for {image_path.name}")
+            self._count("cache_hits")
+            self._index_perceptual_hash(cache_key, image_path)
+            self._revalidate_if_stale(cache_key, image_path, generation)
+            return cached
+
+        if self.near_duplicate_distance is None:
+            return None
+
+        try:
+            value = self.asset_catalog.perceptual_hash(image_path)
+        except Exception:
+            return None
+
+        for distance, match_key in self.phash_index.find(value, self.near_duplicate_distance):
+            entry = self.cache.get_entry(match_key)
+            if entry is None:
+                continue
+            match, generation = entry
+
+            print(f"✓ Reusing journey of a near-duplicate for {image_path.name} "
+                  f"({distance} bits apart)")
+            self._count("near_duplicate_hits")
+            journey = match.model_copy(update={"image_filename": image_path.name})
+
+            # Alias under this file's hash (and the original's generation) so
+            # the next lookup is exact
+            self.cache.put(cache_key, journey, generation)
+            self.phash_index.add(cache_key, value)
+            self._revalidate_if_stale(cache_key, image_path, generation)
+            return journey
+
+        return None
+
+    def create_journey(
+        self,
+        image_path: Path,
+        use_cache: bool = True
+    ) -> SlowLookingJourney:
+        """
+        Create a slow looking journey for an artwork
+
+        Args:
+            image_path: Path to artwork image
+            use_cache: Whether to use cached journey
+
+        Returns:
+            SlowLookingJourney with complete guided experience
+        """
+
+        # The hash of the original file is the cache identity
+        cache_key = self._get_cache_key(image_path)
+
+        # Check cache
+        if use_cache:
+            cached = self.find_cached_journey(image_path, cache_key)
+            if cached is not None:
+                return cached
+
+            # Concurrent requests for the same image share one generation
+            journey, shared = self._in_flight.do(
+                cache_key, lambda: self._create_journey_locked(image_path, cache_key)
+            )
+            if shared:
+                print(f"✓ Shared an in-flight journey for {image_path.name}")
+                journey = self._coalesced_copy(journey, image_path)
+            return journey
+
+        return self._generate_journey(image_path, cache_key)
+
+    def _lock_file(self, cache_key: str) -> Path:
+        """Lock file guarding generation of one cache entry"""
+        lock_file = sharded_path(self._lock_dir, cache_key, ".lock")
+        lock_file.parent.mkdir(parents=True, exist_ok=True)
+        return lock_file
+
+    def _create_journey_locked(self, image_path: Path, cache_key: str) -> SlowLookingJourney:
+        """Generate while holding the cache entry's lock, unless another process just did"""
+        with FileLock(self._lock_file(cache_key)):
+            cached = self.find_cached_journey(image_path, cache_key)
+            if cached is not None:
+                return cached
+            return self._generate_journey(image_path, cache_key)
+
+    def refresh_journey(self, image_path: Path) -> SlowLookingJourney:
+        """
+        Regenerate a journey cached under an older prompt/model/schema
+
+        Goes through the same single-flight and per-key lock as create_journey,
+        so concurrent refreshes of one image (in this process or another one
+        sharing the cache) make a single API call.
+
+        Args:
+            image_path: Path to artwork image
+
+        Returns:
+            The current journey, regenerated only if it was still stale
+        """
+        cache_key = self._get_cache_key(image_path)
+        journey, shared = self._in_flight.do(
+            cache_key, lambda: self._refresh_journey_locked(image_path, cache_key)
+        )
+        if shared:
+            journey = self._coalesced_copy(journey, image_path)
+        return journey
+
+    def _coalesced_copy(self, journey: SlowLookingJourney, image_path: Path) -> SlowLookingJourney:
+        """A single-flight follower's own copy of the leader's journey, named after its image"""
+        self._count("coalesced")
+        return journey.model_copy(deep=True, update={"image_filename": image_path.name})
+
+    def _refresh_journey_locked(self, image_path: Path, cache_key: str) -> SlowLookingJourney:
+        """Regenerate while holding the cache entry's lock, unless another process already did"""
+        with FileLock(self._lock_file(cache_key)):
+            if self.cache.generation_of(cache_key) == self.generation:
+                entry = self.cache.get_entry(cache_key)
+                if entry is not None:
+                    return entry[0]
+            return self._generate_journey(image_path, cache_key)
+
+    def _generate_journey(self, image_path: Path, cache_key: str) -> SlowLookingJourney:
+        """Call the API for a new journey and cache it"""
+        print(f"🎨 Creating slow looking journey for {image_path.name}...")
+
+        # Encode image
+        params = self._build_message_params(image_path, cache_key)
+
+        # Call Claude API
+        try:
+            response = self._call_api(params, image_path, cache_key)
+
+            # Extract response
+            journey = self._parse_journey_response(response, image_path)
+
+            # Cache the result
+            self._cache_journey(cache_key, journey, image_path)
+
+            usage = self.last_usage
+
+            print(f"✓ Journey created: {journey.total_steps} steps, "
+                  f"~{journey.estimated_duration_minutes} min "
+                  f"(confidence: {journey.confidence_score:.0%})")
+            print(f"  Tokens: {usage['input_tokens']} in "
+                  f"(+{usage['cache_read_input_tokens']} cache read, "
+                  f"+{usage['cache_creation_input_tokens']} cache write), "
+                  f"{usage['output_tokens']} out")
+
+            return journey
+
+        except Exception as e:
+            print(f"✗ Error creating journey: {e}")
+            raise
+
+    def _finish_stream(self, stream, cache_key: str, image_path: Path):
+        """Read the complete streamed reply, archiving it and recording its usage"""
+        try:
+            response = stream.get_final_message()
+        except Exception as e:
+            print(f"✗ Stream ended without a complete reply: {e}")
+            return None
+        self._archive_response(cache_key, image_path, response)
+        self._record_usage(response.usage)
+        return response
+
+    def create_journey_stream(
+        self,
+        image_path: Path,
+        use_cache: bool = True
+    ) -> Iterator[tuple[str, object]]:
+        """
+        Create a journey, yielding each part as soon as it is generated
+
+        The visitor can start on step 1 while later steps are still being
+        written. A cache hit replays the same events immediately.
+
+        Args:
+            image_path: Path to artwork image
+            use_cache: Whether to use cached journey
+
+        Yields:
+            ("artwork", ArtworkMetadata), ("welcome_text", str), one
+            ("step", WalkthroughStep) per step, then ("journey",
+            SlowLookingJourney) once the full journey is validated and cached
+        """
+        cache_key = self._get_cache_key(image_path)
+
+        if use_cache:
+            cached = self.find_cached_journey(image_path, cache_key)
+            if cached is not None:
+                yield "artwork", cached.artwork
+                yield "welcome_text", cached.welcome_text
+                for step in cached.steps:
+                    yield "step", step
+                yield "journey", cached
+                return
+
+        print(f"🎨 Streaming slow looking journey for {image_path.name}...")
+
+        params = self._build_message_params(image_path, cache_key)
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self.estimate_request_tokens(image_path))
+
+        parser = IncrementalJourneyParser()
+        try:
+            self._count("api_calls")
+            with self.client.messages.stream(**params) as stream:
+                try:
+                    for event in stream:
+                        if event.type == "text":
+                            yield from parser.feed(event.text)
+                        elif event.type == "input_json":
+                            yield from parser.feed(event.partial_json)
+                finally:
+                    # Keep the paid reply whatever happened above (this
+                    # finishes reading it if the caller stopped early)
+                    response = self._finish_stream(stream, cache_key, image_path)
+
+            if response is None:
+                raise ValueError("Stream ended without a complete reply")
+            journey = self._parse_journey_response(response, image_path)
+            self._cache_journey(cache_key, journey, image_path)
+
+            print(f"✓ Journey streamed: {journey.total_steps} steps")
+            yield "journey", journey
+
+        except Exception as e:
+            print(f"✗ Error streaming journey: {e}")
+            raise
+
+
+# ============================================================================
+# JOURNEY LIBRARY - Save & Retrieve Completed Walkthroughs
+# ============================================================================
+
+def _encode_cursor(completed_at: str, journey_id: str) -> str:
+    """Opaque pagination cursor for the last row of a page"""
+    raw = json.dumps([completed_at, journey_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """Inverse of _encode_cursor; ValueError for anything it didn't produce"""
+    value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(part, str) for part in value)):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    completed_at, journey_id = value
+    return completed_at, journey_id
+
+
+def _check_page_limit(limit: int):
+    """Library queries need room for at least one row per page"""
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+
+
+class LibraryQueryIndex:
+    """
+    In-memory secondary indexes over library index entries
+
+    Entries are kept sorted by (completed_at, journey_id) and by lowercased
+    title, with hash indexes on lowercased artist, step count and duration.
+    All of them are updated per entry, so queries never sort the library.
+    """
+
+    def __init__(self, entries: List[dict] = ()):
+        self._entries = {}
+        self._keys = {}
+        self._by_date = []
+        self._by_title = []
+        self._by_artist = {}
+        self._by_steps = {}
+        self._by_duration = {}
+        for entry in entries:
+            self.upsert(entry)
+
+    @staticmethod
+    def _index_keys(entry: dict) -> tuple:
+        return (
+            entry["completed_at"],
+            (entry.get("artist") or "").casefold(),
+            (entry.get("title") or "").casefold(),
+            entry.get("steps_count"),
+            entry.get("duration_minutes"),
+        )
+
+    def upsert(self, entry: dict):
+        """Add an entry or re-index it after it changed"""
+        journey_id = entry["journey_id"]
+        self.remove(journey_id)
+
+        keys = self._index_keys(entry)
+        completed_at, artist, title, steps, duration = keys
+        self._entries[journey_id] = entry
+        self._keys[journey_id] = keys
+        bisect.insort(self._by_date, (completed_at, journey_id))
+        bisect.insort(self._by_title, (title, journey_id))
+        self._by_artist.setdefault(artist, set()).add(journey_id)
+        self._by_steps.setdefault(steps, set()).add(journey_id)
+        self._by_duration.setdefault(duration, set()).add(journey_id)
+
+    def remove(self, journey_id: str):
+        """Drop an entry from every index"""
+        keys = self._keys.pop(journey_id, None)
+        if keys is None:
+            return
+
+        completed_at, artist, title, steps, duration = keys
+        del self._entries[journey_id]
+        for sorted_list, sort_key in ((self._by_date, completed_at), (self._by_title, title)):
+            position = bisect.bisect_left(sorted_list, (sort_key, journey_id))
+            del sorted_list[position]
+        for hash_index, value in ((self._by_artist, artist),
+                                  (self._by_steps, steps),
+                                  (self._by_duration, duration)):
+            hash_index[value].discard(journey_id)
+            if not hash_index[value]:
+                del hash_index[value]
+
+    def newest_first(self) -> List[dict]:
+        """All entries, most recently completed first"""
+        return [self._entries[journey_id] for _, journey_id in reversed(self._by_date)]
+
+    def _ids_in_range(self, hash_index: dict, low, high) -> Optional[set]:
+        """Union of hash buckets whose key lies in [low, high]; None if unbounded"""
+        if low is None and high is None:
+            return None
+        ids = set()
+        for value, bucket in hash_index.items():
+            if value is None:
+                continue
+            if (low is None or value >= low) and (high is None or value <= high):
+                ids |= bucket
+        return ids
+
+    def query(
+        self,
+        artist: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        completed_after: Optional[str] = None,
+        completed_before: Optional[str] = None,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """See JourneyLibrary.query"""
+        _check_page_limit(limit)
+
+        # Candidate sets from the hash/prefix indexes, smallest first
+        candidate_sets = []
+        if artist is not None:
+            candidate_sets.append(self._by_artist.get(artist.casefold(), set()))
+        if title_prefix:
+            prefix = title_prefix.casefold()
+            start = bisect.bisect_left(self._by_title, (prefix, ""))
+            ids = set()
+            for title, journey_id in self._by_title[start:]:
+                if not title.startswith(prefix):
+                    break
+                ids.add(journey_id)
+            candidate_sets.append(ids)
+        for ids in (self._ids_in_range(self._by_steps, min_steps, max_steps),
+                    self._ids_in_range(self._by_duration, min_duration, max_duration)):
+            if ids is not None:
+                candidate_sets.append(ids)
+
+        candidates = None
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            candidates = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+
+        # Date window, newest end clipped by the cursor
+        low = bisect.bisect_left(self._by_date, (completed_after, "")) if completed_after else 0
+        high = bisect.bisect_left(self._by_date, (completed_before, "")) if completed_before else len(self._by_date)
+        if cursor:
+            high = min(high, bisect.bisect_left(self._by_date, _decode_cursor(cursor)))
+
+        if low >= high:
+            page_keys = []
+        elif candidates is not None and len(candidates) < high - low:
+            # Few matches: sort just those
+            window_start = self._by_date[low] if low < len(self._by_date) else None
+            window_end = self._by_date[high] if high < len(self._by_date) else None
+            keys = sorted(
+                (
+                    (self._keys[journey_id][0], journey_id) for journey_id in candidates
+                ),
+                reverse=True
+            )
+            page_keys = [
+                key for key in keys
+                if (window_start is None or key >= window_start)
+                and (window_end is None or key < window_end)
+            ][:limit + 1]
+        else:
+            # Walk the date index from the newest end
+            page_keys = []
+            for position in range(high - 1, low - 1, -1):
+                key = self._by_date[position]
+                if candidates is None or key[1] in candidates:
+                    page_keys.append(key)
+                    if len(page_keys) > limit:
+                        break
+
+        next_cursor = None
+        if len(page_keys) > limit:
+            page_keys = page_keys[:limit]
+            next_cursor = _encode_cursor(*page_keys[-1])
+
+        return {
+            "journeys": [self._entries[journey_id] for _, journey_id in page_keys],
+            "next_cursor": next_cursor,
+        }
+
+
+class LibraryStats:
+    """
+    Running library aggregates, updated per journey instead of recomputed
+
+    Each journey contributes a small dict of counts (see `contribution`);
+    saving adds it, overwriting first subtracts the old one, so totals stay
+    exact without ever scanning the library.
+    """
+
+    def __init__(self):
+        self.totals = {"journeys": 0, "steps": 0, "minutes": 0,
+                       "look_away_total": 0, "look_away_count": 0}
+        self.artists = {}
+        self.concept_tags = {}
+        self.importance = {}
+
+    @staticmethod
+    def contribution(entry: dict, journey: Optional[SlowLookingJourney] = None) -> dict:
+        """
+        What one journey adds to the aggregates
+
+        Args:
+            entry: The journey's library index entry
+            journey: The full journey, for step-level counts (optional)
+        """
+        concept_tags, importance = {}, {}
+        look_away_total = look_away_count = 0
+        for step in (journey.steps if journey else []):
+            tag = step.region.concept_tag
+            concept_tags[tag] = concept_tags.get(tag, 0) + 1
+            bucket = str(int(round(step.region.importance)))
+            importance[bucket] = importance.get(bucket, 0) + 1
+            look_away_total += step.look_away_duration
+            look_away_count += 1
+
+        return {
+            "artist": entry["artist"],
+            "steps": entry["steps_count"],
+            "minutes": entry["duration_minutes"],
+            "concept_tags": concept_tags,
+            "importance": importance,
+            "look_away_total": look_away_total,
+            "look_away_count": look_away_count,
+        }
+
+    @staticmethod
+    def rows(contribution: dict, sign: int = 1) -> List[tuple[str, str, float]]:
+        """A contribution as (kind, key, delta) rows"""
+        rows = [
+            ("total", "journeys", sign),
+            ("total", "steps", sign * contribution["steps"]),
+            ("total", "minutes", sign * contribution["minutes"]),
+            ("total", "look_away_total", sign * contribution["look_away_total"]),
+            ("total", "look_away_count", sign * contribution["look_away_count"]),
+            ("artist", contribution["artist"], sign),
+        ]
+        rows += [("concept_tag", tag, sign * n) for tag, n in contribution["concept_tags"].items()]
+        rows += [("importance", bucket, sign * n) for bucket, n in contribution["importance"].items()]
+        return rows
+
+    def apply_rows(self, rows: List[tuple[str, str, float]]):
+        """Add (kind, key, delta) rows to the aggregates"""
+        counters = {"artist": self.artists, "concept_tag": self.concept_tags,
+                    "importance": self.importance}
+        for kind, key, delta in rows:
+            counter = self.totals if kind == "total" else counters[kind]
+            counter[key] = counter.get(key, 0) + delta
+            if kind != "total" and not counter[key]:
+                del counter[key]
+
+    def add(self, contribution: dict):
+        self.apply_rows(self.rows(contribution))
+
+    def remove(self, contribution: dict):
+        self.apply_rows(self.rows(contribution, sign=-1))
+
+    def summary(self) -> dict:
+        """Statistics in the shape returned by get_stats"""
+        count = self.totals["look_away_count"]
+        return {
+            "total_journeys": int(self.totals["journeys"]),
+            "total_steps": int(self.totals["steps"]),
+            "total_minutes": int(self.totals["minutes"]),
+            "artists": {k: int(v) for k, v in self.artists.items()},
+            "concept_tags": {k: int(v) for k, v in self.concept_tags.items()},
+            "mean_look_away_seconds": self.totals["look_away_total"] / count if count else None,
+            "importance_distribution": {
+                k: int(v) for k, v in sorted(self.importance.items(), key=lambda kv: int(kv[0]))
+            },
+        }
+
+
+class JourneyLibrary:
+    """
+    Manage saved slow looking journeys
+
+    The index is a snapshot (`_index.json`) plus an append-only journal of
+    changes since (`_index.journal`). Saves append one line under a file
+    lock, so concurrent workers can't overwrite each other's entries and save
+    cost doesn't grow with the library; the journal is folded back into the
+    snapshot in the background once it passes `compact_bytes`.
+    """
+    
+    def __init__(
+        self,
+        library_dir: Path = Path("user_library"),
+        compact_bytes: int = 256 * 1024,
+        search_index: Optional[JourneySearchIndex] = None
+    ):
+        self.library_dir = library_dir
+        self.library_dir.mkdir(exist_ok=True)
+        self.index_file = library_dir / "_index.json"
+        self.journal_file = library_dir / "_index.journal"
+        self.compact_bytes = compact_bytes
+        self.search_index = search_index
+        self._file_lock = FileLock(library_dir / "_index.lock")
+        self._index_lock = threading.RLock()
+        self._compactor = None
+        self._load_index()
+    
+    def _read_index_from_disk(self) -> dict:
+        """Snapshot plus replayed journal, as currently on disk"""
+        if self.index_file.exists():
+            index = json.loads(self.index_file.read_text())
+        else:
+            index = {"journeys": []}
+
+        # Per-journey stats contributions (see LibraryStats)
+        contributions = index.setdefault("contributions", {})
+
+        if self.journal_file.exists():
+            entries_by_id = {j["journey_id"]: j for j in index["journeys"]}
+            with open(self.journal_file, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn final line from a crashed writer
+                    if record["op"] == "contribution":
+                        # Backfilled on load; never overrides one from a save
+                        contributions.setdefault(record["journey_id"], record["contribution"])
+                        continue
+                    entry = record["entry"]
+                    if entry["journey_id"] in entries_by_id:
+                        entries_by_id[entry["journey_id"]].update(entry)
+                    else:
+                        index["journeys"].append(entry)
+                        entries_by_id[entry["journey_id"]] = entry
+                    if "contribution" in record:
+                        contributions[entry["journey_id"]] = record["contribution"]
+
+        return index
+
+    def _load_index(self):
+        """Load library index"""
+        with self._file_lock:
+            index = self._read_index_from_disk()
+            self._backfill_contributions(index)
+        self._set_index(index)
+
+    def _backfill_contributions(self, index: dict):
+        """
+        Count journeys saved before stats were tracked, once
+
+        The contributions are journaled (caller holds the file lock), so
+        later loads and compactions keep them instead of re-reading files.
+        """
+        contributions = index.setdefault("contributions", {})
+        records = []
+        for entry in index["journeys"]:
+            if entry["journey_id"] not in contributions:
+                contribution = LibraryStats.contribution(entry, self._read_journey_file(entry["journey_id"]))
+                contributions[entry["journey_id"]] = contribution
+                records.append({"op": "contribution", "journey_id": entry["journey_id"],
+                                "contribution": contribution})
+        if records:
+            self._write_journal(records)
+
+    def _set_index(self, index: dict):
+        """Install an index read from disk and rebuild the in-memory views"""
+        contributions = index.setdefault("contributions", {})
+        stats = LibraryStats()
+        for entry in index["journeys"]:
+            stats.add(contributions[entry["journey_id"]])
+
+        with self._index_lock:
+            self.index = index
+            self._entries_by_id = {j["journey_id"]: j for j in self.index["journeys"]}
+            self._query_index = LibraryQueryIndex(self.index["journeys"])
+            self._stats = stats
+
+    def _read_journey_file(self, journey_id: str) -> Optional[SlowLookingJourney]:
+        """Load a journey file, or None if it's missing or invalid"""
+        try:
+            return self.get_journey(journey_id)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_journal(self, records: List[dict]) -> int:
+        """Append index changes to the journal (caller holds the file lock); returns its size"""
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self.journal_file, "a", encoding="utf-8") as journal:
+            journal.write(data)
+            return journal.tell()
+
+    def _compact_in_background(self):
+        """Start a compaction unless one is already running"""
+        with self._index_lock:
+            if self._compactor and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._save_index, daemon=True)
+            self._compactor.start()
+
+    def _save_index(self):
+        """Fold the journal into a fresh snapshot (atomic, under the file lock)"""
+        with self._file_lock:
+            # Re-read so entries appended by other processes are kept
+            index = self._read_index_from_disk()
+            data = json.dumps(index, indent=2).encode("utf-8")
+            _atomic_write_bytes(self.index_file, data)
+            self.journal_file.unlink(missing_ok=True)
+
+            # Still under the lock: a save can't slip in between the read
+            # and the install and then be lost from memory
+            self._set_index(index)
+
+    def _index_entry(self, journey: SlowLookingJourney, completed_at: str) -> dict:
+        """Summary row for the library index"""
+        return {
+            "journey_id": journey.journey_id,
+            "image_filename": journey.image_filename,
+            "title": journey.artwork.title or "Untitled",
+            "artist": journey.artwork.artist or "Unknown Artist",
+            "completed_at": completed_at,
+            "steps_count": journey.total_steps,
+            "duration_minutes": journey.estimated_duration_minutes
+        }
+    
+    def save_journey(self, journey: SlowLookingJourney, completed_at: Optional[str] = None):
+        """
+        Save a completed journey to user's library
+        
+        Args:
+            journey: The completed journey
+            completed_at: Timestamp of completion (defaults to now)
+        """
+        completed_at = completed_at or datetime.now().isoformat()
+        
+        # Save full journey data
+        journey_file = self.library_dir / f"{journey.journey_id}.json"
+        _atomic_write_bytes(journey_file, journey.model_dump_json(indent=2).encode("utf-8"))
+        
+        # Update index
+        index_entry = self._index_entry(journey, completed_at)
+        contribution = LibraryStats.contribution(index_entry, journey)
+        record = {"op": "upsert", "entry": index_entry, "contribution": contribution}
+
+        # Memory and journal change together, so a compaction (which
+        # re-reads the journal under this lock) sees every in-memory save
+        with self._file_lock, self._index_lock:
+            existing = self._entries_by_id.get(journey.journey_id)
+            if existing:
+                # Update existing entry
+                existing.update(index_entry)
+            else:
+                # Add new entry
+                self.index["journeys"].append(index_entry)
+                self._entries_by_id[journey.journey_id] = index_entry
+            self._query_index.upsert(self._entries_by_id[journey.journey_id])
+
+            # Swap this journey's share of the running stats
+            previous = self.index["contributions"].get(journey.journey_id)
+            if previous:
+                self._stats.remove(previous)
+            self._stats.add(contribution)
+            self.index["contributions"][journey.journey_id] = contribution
+
+            journal_size = self._write_journal([record])
+
+        if journal_size > self.compact_bytes:
+            self._compact_in_background()
+        if self.search_index is not None:
+            self.search_index.add("library", journey.journey_id, journey)
+        print(f"✓ Journey saved to library: {journey.artwork.title or 'Untitled'}")
+    
+    def get_journey(self, journey_id: str) -> Optional[SlowLookingJourney]:
+        """Retrieve a saved journey by ID"""
+        journey_file = self.library_dir / f"{journey_id}.json"
+        if not journey_file.exists():
+            return None
+        
+        return load_journey_json(journey_file.read_bytes())
+
+    def get_journey_header(self, journey_id: str) -> Optional[JourneyHeader]:
+        """Retrieve a saved journey's summary fields without parsing its steps"""
+        journey_file = self.library_dir / f"{journey_id}.json"
+        if not journey_file.exists():
+            return None
+        return JourneyHeader.from_json(journey_file.read_bytes())
+    
+    def list_journeys(self) -> List[dict]:
+        """Get list of all saved journeys"""
+        with self._index_lock:
+            return self._query_index.newest_first()
+
+    def query(
+        self,
+        artist: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        completed_after: Optional[str] = None,
+        completed_before: Optional[str] = None,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """
+        Find saved journeys, most recently completed first
+
+        Args:
+            artist: Exact artist name (case-insensitive)
+            title_prefix: Start of the title (case-insensitive)
+            completed_after: Earliest completed_at, inclusive (ISO date or timestamp)
+            completed_before: Latest completed_at, exclusive (ISO date or timestamp)
+            min_steps, max_steps: Inclusive step-count range
+            min_duration, max_duration: Inclusive duration range in minutes
+            limit: Page size, at least 1 (ValueError otherwise)
+            cursor: `next_cursor` from the previous page
+
+        Returns:
+            {"journeys": [index entries], "next_cursor": str or None}
+        """
+        with self._index_lock:
+            return self._query_index.query(
+                artist=artist, title_prefix=title_prefix,
+                completed_after=completed_after, completed_before=completed_before,
+                min_steps=min_steps, max_steps=max_steps,
+                min_duration=min_duration, max_duration=max_duration,
+                limit=limit, cursor=cursor
+            )
+    
+    def get_stats(self) -> dict:
+        """
+        Get library statistics
+
+        Totals, per-artist counts, concept_tag histogram, mean look-away time
+        and importance distribution, all kept up to date on save.
+        """
+        with self._index_lock:
+            return self._stats.summary()
+
+
+class SQLiteJourneyLibrary(JourneyLibrary):
+    """
+    Journey library stored in a single SQLite database (WAL mode)
+
+    Saves are one indexed upsert instead of an index rewrite, and several
+    processes can write at once. An existing `_index.json` library in the
+    same directory is imported on first open.
+    """
+
+    COLUMNS = ("journey_id", "image_filename", "title", "artist",
+               "completed_at", "steps_count", "duration_minutes")
+
+    def __init__(
+        self,
+        library_dir: Path = Path("user_library"),
+        db_name: str = "_library.sqlite3",
+        search_index: Optional[JourneySearchIndex] = None
+    ):
+        self.library_dir = library_dir
+        self.library_dir.mkdir(exist_ok=True)
+        self.index_file = library_dir / "_index.json"
+        self.journal_file = library_dir / "_index.journal"
+        self.db_file = library_dir / db_name
+        self.search_index = search_index
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.db_file), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._migrate_index()
+        self._backfill_stats()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _create_schema(self):
+        with self._transaction():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS journeys ("
+                "journey_id TEXT PRIMARY KEY, image_filename TEXT, title TEXT, "
+                "artist TEXT, completed_at TEXT, steps_count INTEGER, "
+                "duration_minutes INTEGER, data TEXT)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS journeys_completed_at ON journeys (completed_at)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS journeys_artist "
+                "ON journeys (artist COLLATE NOCASE, completed_at)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS journeys_title ON journeys (title COLLATE NOCASE)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS library_stats ("
+                "kind TEXT, key TEXT, value REAL NOT NULL, PRIMARY KEY (kind, key))"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(journeys)")]
+            if "stats" not in columns:
+                self._db.execute("ALTER TABLE journeys ADD COLUMN stats TEXT")
+
+    def _apply_stats(self, contribution: dict, sign: int = 1):
+        """Add or subtract a contribution (call inside a transaction)"""
+        self._db.executemany(
+            "INSERT INTO library_stats VALUES (?, ?, ?) "
+            "ON CONFLICT (kind, key) DO UPDATE SET value = value + excluded.value",
+            LibraryStats.rows(contribution, sign)
+        )
+
+    def _backfill_stats(self):
+        """One-shot aggregate build for rows saved before stats were tracked"""
+        with self._transaction():
+            pending = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)}, data FROM journeys WHERE stats IS NULL"
+            ).fetchall()
+            for row in pending:
+                entry = dict(zip(self.COLUMNS, row))
+                journey = load_journey_json(row[-1]) if row[-1] else None
+                contribution = LibraryStats.contribution(entry, journey)
+                self._apply_stats(contribution)
+                self._db.execute("UPDATE journeys SET stats = ? WHERE journey_id = ?",
+                                 (json.dumps(contribution), entry["journey_id"]))
+
+    def _migrate_index(self):
+        """One-shot import of an existing _index.json library"""
+        with self._lock:
+            done = self._db.execute("SELECT 1 FROM meta WHERE key = 'migrated_index'").fetchone()
+        if done or not (self.index_file.exists() or self.journal_file.exists()):
+            return
+
+        entries = self._read_index_from_disk()["journeys"]
+        rows = []
+        for entry in entries:
+            journey_file = self.library_dir / f"{entry['journey_id']}.json"
+            data = journey_file.read_text() if journey_file.exists() else None
+            rows.append(tuple(entry.get(column) for column in self.COLUMNS) + (data,))
+
+        with self._transaction():
+            # Another process may have imported it while we read the files
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'migrated_index'").fetchone():
+                return
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO journeys ({', '.join(self.COLUMNS)}, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.execute("INSERT INTO meta VALUES ('migrated_index', ?)",
+                             (datetime.now().isoformat(),))
+
+        print(f"✓ Migrated {len(rows)} journeys from {self.index_file.name}")
+
+    def save_journey(self, journey: SlowLookingJourney, completed_at: Optional[str] = None):
+        """
+        Save a completed journey to user's library
+
+        Args:
+            journey: The completed journey
+            completed_at: Timestamp of completion (defaults to now)
+        """
+        completed_at = completed_at or datetime.now().isoformat()
+        entry = self._index_entry(journey, completed_at)
+        contribution = LibraryStats.contribution(entry, journey)
+        row = tuple(entry[column] for column in self.COLUMNS) + (
+            journey.model_dump_json(), json.dumps(contribution)
+        )
+
+        with self._transaction():
+            previous = self._db.execute(
+                "SELECT stats FROM journeys WHERE journey_id = ?", (journey.journey_id,)
+            ).fetchone()
+            if previous and previous[0]:
+                self._apply_stats(json.loads(previous[0]), sign=-1)
+
+            self._db.execute(
+                f"INSERT INTO journeys ({', '.join(self.COLUMNS)}, data, stats) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (journey_id) DO UPDATE SET "
+                "image_filename = excluded.image_filename, title = excluded.title, "
+                "artist = excluded.artist, completed_at = excluded.completed_at, "
+                "steps_count = excluded.steps_count, "
+                "duration_minutes = excluded.duration_minutes, "
+                "data = excluded.data, stats = excluded.stats",
+                row
+            )
+            self._apply_stats(contribution)
+        if self.search_index is not None:
+            self.search_index.add("library", journey.journey_id, journey)
+        print(f"✓ Journey saved to library: {journey.artwork.title or 'Untitled'}")
+
+    def _journey_json(self, journey_id: str) -> Optional[Union[str, bytes]]:
+        """Stored JSON of a journey, or None if it isn't saved"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM journeys WHERE journey_id = ?", (journey_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[0] is None:
+            # Indexed before migration but its file was missing then
+            journey_file = self.library_dir / f"{journey_id}.json"
+            return journey_file.read_bytes() if journey_file.exists() else None
+        return row[0]
+
+    def get_journey(self, journey_id: str) -> Optional[SlowLookingJourney]:
+        """Retrieve a saved journey by ID"""
+        data = self._journey_json(journey_id)
+        return load_journey_json(data) if data is not None else None
+
+    def get_journey_header(self, journey_id: str) -> Optional[JourneyHeader]:
+        """Retrieve a saved journey's summary fields without parsing its steps"""
+        data = self._journey_json(journey_id)
+        return JourneyHeader.from_json(data) if data is not None else None
+
+    def list_journeys(self) -> List[dict]:
+        """Get list of all saved journeys"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM journeys ORDER BY completed_at DESC"
+            ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def query(
+        self,
+        artist: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        completed_after: Optional[str] = None,
+        completed_before: Optional[str] = None,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Find saved journeys (see JourneyLibrary.query); served by SQLite indexes"""
+        _check_page_limit(limit)
+
+        clauses, params = [], []
+        if artist is not None:
+            clauses.append("artist = ? COLLATE NOCASE")
+            params.append(artist)
+        if title_prefix:
+            escaped = title_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("title LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+        for column, operator, value in (
+            ("completed_at", ">=", completed_after),
+            ("completed_at", "<", completed_before),
+            ("steps_count", ">=", min_steps),
+            ("steps_count", "<=", max_steps),
+            ("duration_minutes", ">=", min_duration),
+            ("duration_minutes", "<=", max_duration),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+        if cursor:
+            clauses.append("(completed_at, journey_id) < (?, ?)")
+            params.extend(_decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM journeys {where} "
+                "ORDER BY completed_at DESC, journey_id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        journeys = [dict(zip(self.COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(journeys[-1]["completed_at"], journeys[-1]["journey_id"])
+        return {"journeys": journeys, "next_cursor": next_cursor}
+
+    def get_stats(self) -> dict:
+        """Get library statistics (read from the running aggregates table)"""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, key, value FROM library_stats").fetchall()
+        stats = LibraryStats()
+        stats.apply_rows(rows)
+        return stats.summary()
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._db.close()
+
+
+# ============================================================================
+# PIPELINE - Staged producer/consumer processing
+# ============================================================================
+
+class PipelineStage:
+    """One step of a Pipeline: a function applied by its own pool of worker threads"""
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = 16, when=None):
+        """
+        Args:
+            name: Label for stats and errors
+            fn: Called with each item; returns the item for the next stage,
+                or None to drop it
+            workers: Threads running `fn` concurrently
+            queue_size: Items allowed to wait in front of this stage
+            when: Optional predicate; items it rejects pass through untouched
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.when = when
+        self.stats = {"processed": 0, "failed": 0, "passed": 0,
+                      "busy_seconds": 0.0, "waiting_seconds": 0.0}
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues
+
+    Every stage works concurrently with the others, so local CPU and disk
+    work overlaps with network waits, and a full queue makes upstream
+    stages wait instead of piling up memory.
+    """
+
+    _DONE = object()
+
+    def __init__(self, stages: List[PipelineStage], on_error=None):
+        """
+        Args:
+            stages: Stages in order
+            on_error: Called as on_error(item, stage_name, exception); its
+                return value, if not None, is added to the results
+        """
+        self.stages = stages
+        self.on_error = on_error
+        self.source_stats = {"items": 0}
+        self.elapsed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def run(self, source) -> list:
+        """
+        Feed every item from `source` through the stages
+
+        Returns:
+            What the last stage returned, plus on_error results, in
+            completion order
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = []
+        start = time.monotonic()
+
+        def feed():
+            try:
+                for item in source:
+                    with self._lock:
+                        self.source_stats["items"] += 1
+                    queues[0].put(item)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(self._DONE)
+
+        remaining = [stage.workers for stage in self.stages]
+
+        def work(index: int):
+            stage = self.stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            while True:
+                waited = time.monotonic()
+                item = inbox.get()
+                began = time.monotonic()
+                if item is self._DONE:
+                    break
+
+                if stage.when is not None and not stage.when(item):
+                    with self._lock:
+                        stage.stats["waiting_seconds"] += began - waited
+                        stage.stats["passed"] += 1
+                    if outbox is None:
+                        with self._lock:
+                            results.append(item)
+                    else:
+                        outbox.put(item)
+                    continue
+
+                try:
+                    output = stage.fn(item)
+                    failed = False
+                except Exception as e:
+                    output = self.on_error(item, stage.name, e) if self.on_error else None
+                    failed = True
+
+                with self._lock:
+                    stage.stats["waiting_seconds"] += began - waited
+                    stage.stats["busy_seconds"] += time.monotonic() - began
+                    stage.stats["failed" if failed else "processed"] += 1
+
+                if output is None:
+                    continue
+                if failed or outbox is None:
+                    with self._lock:
+                        results.append(output)
+                else:
+                    outbox.put(output)
+
+            # The last worker out tells the next stage there's nothing more
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    outbox.put(self._DONE)
+
+        threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}", daemon=True)
+                for _ in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.elapsed_seconds = time.monotonic() - start
+        return results
+
+    def report(self) -> List[dict]:
+        """Per-stage throughput and utilization for the last run"""
+        elapsed = self.elapsed_seconds or 1e-9
+        rows = [{
+            "stage": "discover",
+            "workers": 1,
+            "items": self.source_stats["items"],
+            "failed": 0,
+            "passed": 0,
+            "per_second": self.source_stats["items"] / elapsed,
+            "avg_ms": 0.0,
+            "utilization": None,  # Mostly blocked on the first queue, by design
+        }]
+        for stage in self.stages:
+            done = stage.stats["processed"] + stage.stats["failed"]
+            rows.append({
+                "stage": stage.name,
+                "workers": stage.workers,
+                "items": done,
+                "failed": stage.stats["failed"],
+                "passed": stage.stats["passed"],
+                "per_second": done / elapsed,
+                "avg_ms": stage.stats["busy_seconds"] / done * 1000 if done else 0.0,
+                "utilization": stage.stats["busy_seconds"] / (elapsed * stage.workers),
+            })
+        return rows
+
+
+# ============================================================================
+# WORK LEASES - Claims on shared work across nodes
+# ============================================================================
+
+class WorkLease(BaseModel):
+    """A node's claim on one piece of work, valid until `expires_at` unless renewed"""
+    key: str
+    node_id: str
+    token: str
+    expires_at: float  # time.time(); nodes need roughly synchronised clocks
+
+
+class LeaseStore:
+    """
+    Expiring work claims stored as files in a shared directory
+
+    Built only on operations that stay atomic on network mounts: a claim
+    is created by hard-linking a fully written temp file into place (which
+    fails if the lease exists), and an expired claim is broken by renaming
+    it away, which only one node can do. Held leases are renewed by a
+    heartbeat thread; if a node dies, its leases run out after
+    `visibility_timeout` and the work can be claimed again.
+    """
+
+    def __init__(
+        self,
+        lease_dir: Path,
+        visibility_timeout: float = 300.0,
+        heartbeat_seconds: Optional[float] = None,
+        node_id: Optional[str] = None
+    ):
+        """
+        Args:
+            lease_dir: Directory shared by every node
+            visibility_timeout: Seconds a claim lasts without a heartbeat
+            heartbeat_seconds: Renewal interval (default: a third of the timeout)
+            node_id: Name recorded in leases (default: hostname-pid)
+        """
+        self.lease_dir = lease_dir
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_seconds = heartbeat_seconds or visibility_timeout / 3
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        self._held = {}  # key -> WorkLease
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()  # So a renewal can't resurrect a released lease
+        self._heartbeat = None
+        self.stats = {"acquired": 0, "busy": 0, "recovered": 0, "renewed": 0, "lost": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.lease_dir / f"{key}.lease"
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _read(self, path: Path) -> Optional[WorkLease]:
+        """The lease in a file, or None if there is none"""
+        try:
+            data = path.read_bytes()
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        try:
+            return WorkLease.model_validate_json(data)
+        except ValidationError:
+            # Being written without hard links, or torn; give it a full timeout
+            return WorkLease(key=path.stem, node_id="?", token="",
+                             expires_at=mtime + self.visibility_timeout)
+
+    def _create(self, path: Path, lease: WorkLease) -> bool:
+        """Write a lease unless one exists; True if it was ours to write"""
+        data = lease.model_dump_json().encode("utf-8")
+        tmp_path = path.with_name(f".{path.name}.{lease.token}.tmp")
+        tmp_path.write_bytes(data)
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # No hard links on this filesystem: exclusive create, then fill in
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return True
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _break(self, path: Path, expired: WorkLease) -> bool:
+        """Remove an expired lease; False if it turned out to be live after all"""
+        tomb = path.with_name(f".{path.name}.{uuid.uuid4().hex}.expired")
+        try:
+            os.rename(path, tomb)
+        except FileNotFoundError:
+            return True  # Released or broken by someone else meanwhile
+
+        taken = self._read(tomb)
+        if taken is not None and taken.token != expired.token:
+            # Renewed or re-claimed since we looked: put it back
+            try:
+                os.link(tomb, path)
+            except OSError:
+                pass
+            tomb.unlink(missing_ok=True)
+            return False
+
+        tomb.unlink(missing_ok=True)
+        return True
+
+    def acquire(self, key: str) -> Optional[WorkLease]:
+        """
+        Claim a piece of work
+
+        Args:
+            key: What is being claimed (e.g. an image's cache key)
+
+        Returns:
+            The lease, or None if another holder's lease is still live
+        """
+        path = self._path(key)
+        for _ in range(3):
+            lease = WorkLease(
+                key=key,
+                node_id=self.node_id,
+                token=uuid.uuid4().hex,
+                expires_at=time.time() + self.visibility_timeout
+            )
+            if self._create(path, lease):
+                with self._lock:
+                    self._held[key] = lease
+                    self.stats["acquired"] += 1
+                self._start_heartbeat()
+                return lease
+
+            current = self._read(path)
+            if current is None:
+                continue  # Released between our attempt and the read
+            if current.expires_at > time.time() or not self._break(path, current):
+                break
+            print(f"⚠️  Lease on {key} from {current.node_id} expired; reclaiming")
+            self._count("recovered")
+
+        self._count("busy")
+        return None
+
+    def renew(self, lease: WorkLease) -> bool:
+        """
+        Push a held lease's expiry out by another visibility timeout
+
+        Returns:
+            False if the lease was lost (it expired and was claimed elsewhere)
+        """
+        path = self._path(lease.key)
+        with self._file_lock:
+            if not self.holds(lease):
+                return False  # Released meanwhile
+
+            current = self._read(path)
+            if current is None or current.token != lease.token:
+                with self._lock:
+                    del self._held[lease.key]
+                    self.stats["lost"] += 1
+                print(f"⚠️  Lost lease on {lease.key}")
+                return False
+
+            renewed = lease.model_copy(update={"expires_at": time.time() + self.visibility_timeout})
+            _atomic_write_bytes(path, renewed.model_dump_json().encode("utf-8"))
+            lease.expires_at = renewed.expires_at
+        self._count("renewed")
+        return True
+
+    def release(self, lease: WorkLease):
+        """Give up a lease (a no-op if it was already lost)"""
+        path = self._path(lease.key)
+        with self._file_lock:
+            with self._lock:
+                if self._held.get(lease.key) is lease:
+                    del self._held[lease.key]
+
+            current = self._read(path)
+            if current is not None and current.token == lease.token:
+                path.unlink(missing_ok=True)
+
+    def holds(self, lease: WorkLease) -> bool:
+        """Whether the lease is still ours, as far as the heartbeat knows"""
+        with self._lock:
+            return self._held.get(lease.key) is lease
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._renew_loop, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _renew_loop(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                held = list(self._held.values())
+            for lease in held:
+                try:
+                    self.renew(lease)
+                except OSError as e:
+                    print(f"⚠️  Lease heartbeat failed for {lease.key}: {e}")
+
+
+# ============================================================================
+# GALLERY PROGRESS LOG - Append-only checkpoints
+# ============================================================================
+
+class GalleryProgressLog:
+    """JSON-lines log with one record per finished image, appended as it finishes"""
+
+    def __init__(self, log_file: Path):
+        self.log_file = log_file
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start an empty log (a fresh, non-resumed run)"""
+        with self._lock:
+            self.log_file.write_bytes(b"")
+
+    def append(self, record: dict):
+        """Append one record and push it to disk before returning"""
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.log_file, "a+b") as f:
+                # A crash mid-write leaves a torn last line; don't glue onto it
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> dict:
+        """
+        Latest record per image filename, in the order images first finished
+
+        Lines that don't parse (a torn final write) are skipped.
+        """
+        records = {}
+        if not self.log_file.exists():
+            return records
+
+        with open(self.log_file, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record["filename"]] = record
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return records
+
+
+# ============================================================================
+# BATCH PROCESSOR FOR GALLERY
+# ============================================================================
+
+class GalleryPreprocessor:
+    """Pre-process artworks for curated gallery"""
+    
+    def __init__(
+        self, 
+        analyzer: SlowLookingAnalyzer, 
+        output_dir: Path = Path("gallery_journeys")
+    ):
+        self.analyzer = analyzer
+        self.output_dir = output_dir
+        self.output_dir.mkdir(exist_ok=True)
+        self.progress_log = GalleryProgressLog(output_dir / "_gallery_progress.jsonl")
+    
+    def _find_images(self, artwork_dir: Path) -> List[Path]:
+        """Find all supported images in a directory"""
+        images = []
+        for ext in ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp"]:
+            images.extend(artwork_dir.glob(ext))
+        return images
+
+    def _process_image(self, image_path: Path) -> dict:
+        """Create and save the journey for one image, returning its report row"""
+        try:
+            # Create journey
+            journey = self.analyzer.create_journey(
+                image_path,
+                use_cache=True
+            )
+
+            return self._save_gallery_journey(image_path, journey)
+
+        except Exception as e:
+            print(f"✗ Error: {e}")
+            return self._error_row(image_path, e)
+
+    def _output_file(self, image_path: Path) -> Path:
+        return self.output_dir / f"{image_path.stem}.json"
+
+    def _save_gallery_journey(self, image_path: Path, journey: SlowLookingJourney) -> dict:
+        """Write a journey to the gallery output, log it and return its report row"""
+        try:
+            cache_key = self.analyzer._get_cache_key(image_path)
+            generation = self.analyzer.cache.generation_of(cache_key)
+        except OSError:
+            cache_key = generation = None  # Image gone; this row just won't resume
+
+        output_file = self._output_file(image_path)
+        _atomic_write_bytes(output_file, journey.model_dump_json(indent=2).encode("utf-8"))
+
+        row = {
+            "filename": image_path.name,
+            "status": "success",
+            "steps": journey.total_steps,
+            "duration": journey.estimated_duration_minutes,
+            "confidence": journey.confidence_score
+        }
+        self._log_progress(row, cache_key, generation)
+        return row
+
+    def _error_row(self, image_path: Path, error) -> dict:
+        """Log and return the report row for an image that could not be processed"""
+        row = {
+            "filename": image_path.name,
+            "status": "error",
+            "error": str(error)
+        }
+        self._log_progress(row)
+        return row
+
+    def _log_progress(self, row: dict, cache_key: Optional[str] = None, generation: Optional[str] = None):
+        """Checkpoint one finished image in the progress log"""
+        self.progress_log.append({
+            "filename": row["filename"],
+            "cache_key": cache_key,
+            "generation": generation,
+            "finished_at": datetime.now().isoformat(),
+            "row": row
+        })
+
+    def _resume_records(self, resume: bool) -> dict:
+        """Progress records of the run being resumed, or a fresh log if not resuming"""
+        if not resume:
+            self.progress_log.reset()
+            return {}
+        return self.progress_log.load()
+
+    def _is_current(self, image_path: Path, record: Optional[dict]) -> bool:
+        """
+        Whether an earlier run's output for this image can be kept as is
+
+        True when the logged run succeeded for the same file content (cache
+        key, memoized by the asset catalog) and the same prompt/model/schema
+        generation, and the output file still exists.
+        """
+        try:
+            return (
+                record is not None
+                and record["row"]["status"] == "success"
+                and record["generation"] == self.analyzer.generation
+                and record["cache_key"] == self.analyzer._get_cache_key(image_path)
+                and self._output_file(image_path).exists()
+            )
+        except OSError:
+            return False
+
+    def _resume_filter(self, images: List[Path], resume: bool) -> tuple[List[Path], dict]:
+        """
+        Split off images whose gallery output is already current
+
+        Returns:
+            (images still to process, report rows of the skipped images)
+        """
+        records = self._resume_records(resume)
+        todo, done = [], {}
+        for image_path in images:
+            record = records.get(image_path.name)
+            if self._is_current(image_path, record):
+                done[image_path] = record["row"]
+            else:
+                todo.append(image_path)
+
+        if done:
+            print(f"⏭ Resuming: {len(done)} images already done, {len(todo)} to go")
+        return todo, done
+
+    def compile_gallery_report(self) -> List[dict]:
+        """
+        Rebuild `_gallery_report.json` from the progress log
+
+        Useful after a run was interrupted before it wrote its own report.
+
+        Returns:
+            The report rows, latest result per image
+        """
+        results = [record["row"] for record in self.progress_log.load().values()]
+        report_file = self.output_dir / "_gallery_report.json"
+        _atomic_write_bytes(report_file, json.dumps(results, indent=2).encode("utf-8"))
+        return results
+
+    def process_gallery(
+        self,
+        artwork_dir: Path,
+        delay_seconds: float = 2.0,
+        max_concurrency: int = 1,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        resume: bool = False
+    ):
+        """
+        Process all artworks in directory
+
+        With the defaults, images are processed one at a time with a fixed
+        delay between them. Setting `max_concurrency` above 1, or any of the
+        per-minute budgets, keeps up to `max_concurrency` journeys in flight
+        and paces API calls with a token bucket instead of the fixed delay.
+
+        Each finished image is appended to `_gallery_progress.jsonl` as it
+        completes, so an interrupted run can be picked up with `resume=True`.
+
+        Args:
+            artwork_dir: Directory with artwork images
+            delay_seconds: Delay between API calls (sequential mode only)
+            max_concurrency: Number of create_journey calls kept in flight
+            requests_per_minute: Request budget for concurrent mode
+            tokens_per_minute: Input-token budget for concurrent mode
+            resume: Skip images whose output from an earlier run is still current
+        """
+
+        # Find images
+        all_images = self._find_images(artwork_dir)
+
+        if not all_images:
+            print(f"No images found in {artwork_dir}")
+            return
+
+        images, done = self._resume_filter(all_images, resume)
+
+        print(f"\n{'='*60}")
+        print(f"Creating {len(images)} slow looking journeys")
+        print(f"{'='*60}\n")
+
+        concurrent = max_concurrency > 1 or requests_per_minute or tokens_per_minute
+        if concurrent:
+            with self._rate_limited(requests_per_minute, tokens_per_minute):
+                results = self._process_concurrently(images, max_concurrency)
+        else:
+            results = self._process_sequentially(images, delay_seconds)
+
+        rows = {**done, **dict(zip(images, results))}
+        self._finish_run([rows[image_path] for image_path in all_images])
+
+    @contextlib.contextmanager
+    def _rate_limited(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]):
+        """Give the analyzer a budget for the duration of one run, then restore its own limiter"""
+        if not (requests_per_minute or tokens_per_minute):
+            yield
+            return
+
+        previous = self.analyzer.rate_limiter
+        self.analyzer.rate_limiter = TokenBucketRateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute
+        )
+        try:
+            yield
+        finally:
+            self.analyzer.rate_limiter = previous
+
+    def _process_sequentially(self, images: List[Path], delay_seconds: float) -> List[dict]:
+        """Process images one at a time with a fixed delay between calls"""
+        results = []
+
+        for i, image_path in enumerate(images, 1):
+            print(f"\n[{i}/{len(images)}] {image_path.name}")
+            print("-" * 40)
+
+            result = self._process_image(image_path)
+            results.append(result)
+
+            # Rate limit
+            if result["status"] == "success" and i < len(images):
+                time.sleep(delay_seconds)
+
+        return results
+
+    def _process_concurrently(self, images: List[Path], max_concurrency: int) -> List[dict]:
+        """Keep up to `max_concurrency` images in flight; results keep input order"""
+        completed = 0
+        progress_lock = threading.Lock()
+
+        def run(image_path: Path) -> dict:
+            nonlocal completed
+            result = self._process_image(image_path)
+            with progress_lock:
+                completed += 1
+                mark = "✓" if result["status"] == "success" else "✗"
+                print(f"[{completed}/{len(images)}] {mark} {image_path.name}")
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            return list(pool.map(run, images))
+
+    def process_gallery_pipeline(
+        self,
+        artwork_dir: Path,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        prepare_workers: Optional[int] = None,
+        queue_size: int = 16,
+        render=None,
+        resume: bool = False
+    ):
+        """
+        Process all artworks as a staged pipeline
+
+        Hashing, cache lookups and resizing, base64 encoding, API requests
+        and writing outputs each run on their own workers with bounded queues
+        in between, so local work for upcoming images happens while earlier
+        ones wait on the API. Per-stage throughput is reported at the end.
+
+        Requests go through the same single-flight and per-key lock as
+        create_journey, so other runs or services sharing cache_dir never
+        pay for the same image twice.
+
+        Args:
+            artwork_dir: Directory with artwork images
+            max_concurrency: API requests kept in flight
+            requests_per_minute: Request budget (None = unlimited)
+            tokens_per_minute: Input-token budget (None = unlimited)
+            prepare_workers: Threads hashing and resizing images (default: CPU count)
+            queue_size: Items allowed to wait between two stages
+            render: Optional callback(image_path, journey), e.g. drawing the
+                region overlay; runs as a final stage of its own
+            resume: Skip images whose output from an earlier run is still current
+        """
+        analyzer = self.analyzer
+        claimed = set()    # Cache keys already being generated in this run
+        duplicates = []    # Images whose journey another item is generating
+        claim_lock = threading.Lock()
+        needs_api = lambda item: "journey" not in item
+
+        def prepare(item: dict) -> Optional[dict]:
+            image_path = item["image_path"]
+            cache_key = item["cache_key"] = analyzer._get_cache_key(image_path)
+
+            cached = analyzer.find_cached_journey(image_path, cache_key)
+            if cached is not None:
+                item["journey"] = cached
+                return item
+
+            with claim_lock:
+                if cache_key in claimed:
+                    duplicates.append(image_path)
+                    return None
+                claimed.add(cache_key)
+
+            item["payload"] = analyzer._load_image_payload(image_path, cache_key)
+            return item
+
+        def encode(item: dict) -> dict:
+            item["params"] = analyzer._build_message_params(
+                item["image_path"], item["cache_key"], item.pop("payload")
+            )
+            return item
+
+        def generate(image_path: Path, cache_key: str, params: dict) -> SlowLookingJourney:
+            # Parsed and cached before the lock is released, so whoever
+            # takes it next finds the journey
+            with FileLock(analyzer._lock_file(cache_key)):
+                cached = analyzer.find_cached_journey(image_path, cache_key)
+                if cached is not None:
+                    return cached
+                response = analyzer._call_api(params, image_path, cache_key)
+                journey = analyzer._parse_journey_response(response, image_path)
+                analyzer._cache_journey(cache_key, journey, image_path)
+                return journey
+
+        def request(item: dict) -> dict:
+            image_path, cache_key, params = item["image_path"], item["cache_key"], item.pop("params")
+            journey, shared = analyzer._in_flight.do(cache_key, lambda: generate(image_path, cache_key, params))
+            if shared:
+                journey = analyzer._coalesced_copy(journey, image_path)
+            item["journey"] = journey
+            return item
+
+        def persist(item: dict) -> dict:
+            item["row"] = self._save_gallery_journey(item["image_path"], item["journey"])
+            return item
+
+        def render_stage(item: dict) -> dict:
+            render(item["image_path"], item["journey"])
+            return item
+
+        def on_error(item: dict, stage: str, error: Exception) -> dict:
+            print(f"✗ Error ({stage}): {item['image_path'].name}: {error}")
+            return {"image_path": item["image_path"], "row": self._error_row(item["image_path"], error)}
+
+        stages = [
+            PipelineStage("prepare", prepare, workers=prepare_workers or os.cpu_count() or 4,
+                          queue_size=queue_size),
+            PipelineStage("encode", encode, workers=2, queue_size=queue_size, when=needs_api),
+            PipelineStage("request", request, workers=max_concurrency,
+                          queue_size=max(queue_size, max_concurrency), when=needs_api),
+            PipelineStage("persist", persist, workers=2, queue_size=queue_size),
+        ]
+        if render:
+            stages.append(PipelineStage("render", render_stage, workers=2, queue_size=queue_size))
+        pipeline = Pipeline(stages, on_error=on_error)
+
+        print(f"\n{'='*60}")
+        print(f"Creating slow looking journeys for {artwork_dir} (pipelined)")
+        print(f"{'='*60}\n")
+
+        images = []
+        done = {}  # Images kept from the run being resumed
+        records = self._resume_records(resume)
+
+        def discover():
+            for image_path in self._find_images(artwork_dir):
+                images.append(image_path)
+                record = records.get(image_path.name)
+                if self._is_current(image_path, record):
+                    done[image_path] = record["row"]
+                else:
+                    yield {"image_path": image_path}
+
+        with self._rate_limited(requests_per_minute, tokens_per_minute):
+            rows = {item["image_path"]: item["row"] for item in pipeline.run(discover())}
+
+            # Same image content as one generated above: now a cache hit
+            for image_path in duplicates:
+                rows[image_path] = self._process_image(image_path)
+
+        rows.update(done)
+        if done:
+            print(f"⏭ Resumed: {len(done)} images were already done")
+
+        if not images:
+            print(f"No images found in {artwork_dir}")
+            return
+
+        self._print_stage_report(pipeline)
+        self._finish_run([rows[image_path] for image_path in images])
+
+    def _print_stage_report(self, pipeline: Pipeline):
+        """Per-stage throughput of a pipelined run"""
+        print(f"\n{'Stage':<10}{'Workers':>8}{'Items':>7}{'Skipped':>8}{'Failed':>7}"
+              f"{'Items/s':>9}{'Avg ms':>9}{'Busy':>7}")
+        for row in pipeline.report():
+            busy = f"{row['utilization']:.0%}" if row["utilization"] is not None else "-"
+            print(f"{row['stage']:<10}{row['workers']:>8}{row['items']:>7}{row['passed']:>8}"
+                  f"{row['failed']:>7}{row['per_second']:>9.1f}{row['avg_ms']:>9.1f}{busy:>7}")
+        print(f"Wall time: {pipeline.elapsed_seconds:.1f}s")
+
+    def process_gallery_distributed(
+        self,
+        artwork_dir: Path,
+        max_concurrency: int = 1,
+        visibility_timeout: float = 300.0,
+        poll_seconds: float = 5.0,
+        node_id: Optional[str] = None,
+        resume: bool = False
+    ):
+        """
+        Process all artworks as one of several nodes sharing a cache directory
+
+        Run this on every machine with the same artwork collection and a
+        network-mounted cache_dir. Before generating, a node takes a lease
+        on the image's cache key in cache_dir/_leases, so each journey is
+        generated by exactly one node; images leased elsewhere are revisited
+        until their journey shows up in the shared cache. A node that dies
+        stops renewing its leases and its images are picked up by the others
+        once `visibility_timeout` has passed. The output directory (and its
+        progress log) should be local to each node.
+
+        Args:
+            artwork_dir: Directory with artwork images
+            max_concurrency: Images this node works on at once
+            visibility_timeout: Seconds a lease survives without a heartbeat
+            poll_seconds: Delay between checks on images leased elsewhere
+            node_id: Name recorded in leases (default: hostname-pid)
+            resume: Skip images whose output from an earlier run is still current
+        """
+        all_images = self._find_images(artwork_dir)
+
+        if not all_images:
+            print(f"No images found in {artwork_dir}")
+            return
+
+        analyzer = self.analyzer
+        leases = LeaseStore(analyzer.cache_dir / "_leases", visibility_timeout, node_id=node_id)
+        waiting, rows = self._resume_filter(all_images, resume)
+
+        print(f"\n{'='*60}")
+        print(f"Creating {len(waiting)} slow looking journeys (node {leases.node_id})")
+        print(f"{'='*60}\n")
+
+        def attempt(image_path: Path) -> Optional[dict]:
+            """Report row, or None if another node is generating this journey"""
+            try:
+                cache_key = analyzer._get_cache_key(image_path)
+            except Exception as e:
+                print(f"✗ Error: {e}")
+                return self._error_row(image_path, e)
+
+            if cache_key in analyzer.cache:
+                return self._process_image(image_path)
+
+            lease = leases.acquire(cache_key)
+            if lease is None:
+                return None
+            try:
+                # create_journey checks the cache again, now that we hold the lease
+                return self._process_image(image_path)
+            finally:
+                leases.release(lease)
+
+        while waiting:
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+                outcomes = list(pool.map(attempt, waiting))
+
+            deferred = []
+            for image_path, row in zip(waiting, outcomes):
+                if row is None:
+                    deferred.append(image_path)
+                else:
+                    rows[image_path] = row
+
+            waiting = deferred
+            if waiting:
+                print(f"⏳ {len(waiting)} images leased by other nodes; checking again in {poll_seconds:g}s")
+                time.sleep(poll_seconds)
+
+        print(f"\n🔐 Leases: {leases.stats['acquired']} taken, {leases.stats['recovered']} recovered "
+              f"from dead nodes, {leases.stats['lost']} lost")
+        self._finish_run([rows[image_path] for image_path in all_images])
+
+    def process_gallery_batch(
+        self,
+        artwork_dir: Path,
+        poll_interval_seconds: float = 60.0,
+        max_batch_bytes: int = 200_000_000,
+        resume: bool = False
+    ):
+        """
+        Process all artworks through the Message Batches API
+
+        Uncached images are submitted as one batch (split only when the
+        request payload would exceed the API's size limit), then results are
+        parsed, validated and cached exactly like create_journey does. Batches
+        cost half as much as regular calls and don't count against the
+        per-minute rate limits, but can take up to 24 hours to finish.
+
+        Args:
+            artwork_dir: Directory with artwork images
+            poll_interval_seconds: Delay between batch status checks
+            max_batch_bytes: Payload size at which a new batch is started
+            resume: Skip images whose output from an earlier run is still current
+        """
+
+        images = self._find_images(artwork_dir)
+
+        if not images:
+            print(f"No images found in {artwork_dir}")
+            return
+
+        todo, rows = self._resume_filter(images, resume)
+
+        print(f"\n{'='*60}")
+        print(f"Creating {len(todo)} slow looking journeys (batch mode)")
+        print(f"{'='*60}\n")
+
+        pending = {}  # cache key -> images with that content
+
+        for image_path in todo:
+            try:
+                cache_key = self.analyzer._get_cache_key(image_path)
+                journey = self.analyzer.find_cached_journey(image_path, cache_key)
+                if journey is not None:
+                    rows[image_path] = self._save_gallery_journey(image_path, journey)
+                else:
+                    pending.setdefault(cache_key, []).append(image_path)
+            except Exception as e:
+                print(f"✗ Error: {e}")
+                rows[image_path] = self._error_row(image_path, e)
+
+        batch_ids = self._submit_batches(pending, max_batch_bytes)
+
+        for batch_id in batch_ids:
+            self._wait_for_batch(batch_id, poll_interval_seconds)
+            self._collect_batch_results(batch_id, pending, rows)
+
+        # Anything the batch never reported on (e.g. request build failures)
+        for image_paths in pending.values():
+            for image_path in image_paths:
+                if image_path not in rows:
+                    rows[image_path] = self._error_row(image_path, "No result returned by batch")
+
+        results = [rows[image_path] for image_path in images]
+        self._finish_run(results)
+
+    def _submit_batches(self, pending: dict, max_batch_bytes: int) -> List[str]:
+        """Submit batch requests for uncached images, returning the batch ids"""
+        batch_ids = []
+        requests = []
+        request_bytes = 0
+
+        def submit():
+            batch = self.analyzer.client.messages.batches.create(requests=requests)
+            print(f"📦 Submitted batch {batch.id} with {len(requests)} requests")
+            batch_ids.append(batch.id)
+            self.analyzer._count("batch_requests", len(requests))
+
+        for cache_key, image_paths in pending.items():
+            try:
+                params = self.analyzer._build_message_params(image_paths[0], cache_key)
+            except Exception as e:
+                print(f"✗ Error: {e}")
+                continue
+
+            size = len(params["messages"][0]["content"][0]["source"]["data"])
+            if requests and request_bytes + size > max_batch_bytes:
+                submit()
+                requests, request_bytes = [], 0
+
+            requests.append({"custom_id": cache_key, "params": params})
+            request_bytes += size
+
+        if requests:
+            submit()
+
+        return batch_ids
+
+    def _wait_for_batch(self, batch_id: str, poll_interval_seconds: float):
+        """Poll a batch until it has finished processing"""
+        while True:
+            batch = self.analyzer.client.messages.batches.retrieve(batch_id)
+            if batch.processing_status == "ended":
+                return
+
+            counts = batch.request_counts
+            print(f"⏳ Batch {batch_id}: {counts.processing} processing, "
+                  f"{counts.succeeded} succeeded, {counts.errored} errored")
+            time.sleep(poll_interval_seconds)
+
+    def _collect_batch_results(self, batch_id: str, pending: dict, rows: dict):
+        """Stream batch results through the normal parse, validate and cache path"""
+        for entry in self.analyzer.client.messages.batches.results(batch_id):
+            image_paths = pending.get(entry.custom_id, [])
+            if not image_paths:
+                continue
+
+            if entry.result.type != "succeeded":
+                if entry.result.type == "errored":
+                    error = entry.result.error.error.message
+                else:
+                    error = f"Batch request {entry.result.type}"
+                print(f"✗ Error: {image_paths[0].name}: {error}")
+                for image_path in image_paths:
+                    rows[image_path] = self._error_row(image_path, error)
+                continue
+
+            self.analyzer._record_usage(entry.result.message.usage)
+            self.analyzer._archive_response(entry.custom_id, image_paths[0], entry.result.message)
+
+            try:
+                journey = self.analyzer._parse_journey_response(
+                    entry.result.message,
+                    image_paths[0]
+                )
+                self.analyzer._cache_journey(entry.custom_id, journey, image_paths[0])
+                print(f"✓ Journey created for {image_paths[0].name}: "
+                      f"{journey.total_steps} steps")
+
+                for image_path in image_paths:
+                    rows[image_path] = self._save_gallery_journey(image_path, journey)
+            except Exception as e:
+                print(f"✗ Error: {image_paths[0].name}: {e}")
+                for image_path in image_paths:
+                    rows[image_path] = self._error_row(image_path, e)
+
+    def _finish_run(self, results: List[dict]):
+        """Print and save the run report"""
         self._print_report(results)
-        
+
         # Save report
         report_file = self.output_dir / "_gallery_report.json"
-        report_file.write_text(json.dumps(results, indent=2))
-    
+        _atomic_write_bytes(report_file, json.dumps(results, indent=2).encode("utf-8"))
+
+        # Keep hashes from this run for the next one
+        self.analyzer.asset_catalog.flush()
+        self.analyzer.phash_index.flush()
+
     def _print_report(self, results):
         """Print processing summary"""
         successes = [r for r in results if r["status"] == "success"]
@@ -615,7 +5136,37 @@ class GalleryPreprocessor:
             print(f"\nAverage steps: {avg_steps:.1f}")
             print(f"Average duration: {avg_duration:.1f} minutes")
             print(f"Average confidence: {avg_confidence:.0%}")
-        
+
+        stats = self.analyzer.stats
+        print(f"\nAPI calls: {stats['api_calls']}")
+        if stats.get("batch_requests"):
+            print(f"Batch requests: {stats['batch_requests']} (billed at half price)")
+        print(f"Cache hits: {stats['cache_hits']}")
+        print(f"Near-duplicate reuse: {stats['near_duplicate_hits']} calls saved")
+        if stats["coalesced"]:
+            print(f"Shared in-flight generations: {stats['coalesced']} calls saved")
+        cache_stats = self.analyzer.cache.stats
+        print(f"Journey cache: {cache_stats['memory_hits']} memory hits, "
+              f"{cache_stats['disk_hits']} disk hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['evictions']} evicted")
+        if stats.get("stale_hits"):
+            revalidator = self.analyzer.revalidator
+            refreshing = f", {revalidator.pending} refreshing in background" if revalidator else ""
+            print(f"Stale journeys served: {stats['stale_hits']}{refreshing}")
+        controller = self.analyzer.rate_controller
+        if controller:
+            print(f"Retries: {controller.stats['retries']} "
+                  f"({controller.stats['throttled']} throttled, "
+                  f"circuit opened {controller.stats['circuit_opened']}x), "
+                  f"final concurrency {controller.concurrency_limit}")
+        if stats.get("validation_failures") or stats.get("parse_failures"):
+            print(f"Invalid replies: {stats.get('parse_failures', 0)} unparseable, "
+                  f"{stats.get('repaired_responses', 0)} repaired locally, "
+                  f"{stats.get('unrepairable_responses', 0)} wasted")
+        if stats.get("input_tokens") or stats.get("cache_read_input_tokens"):
+            print(f"Prompt cache: {stats['cache_read_input_tokens']} tokens read, "
+                  f"{stats['cache_creation_input_tokens']} written")
+
         print(f"{'='*60}\n")
 
 
@@ -630,7 +5181,7 @@ if __name__ == "__main__":
     print("="*60)
     
     # Initialize
-    analyzer = SlowLookingAnalyzer(cache_dir=Path("journeys_cache"))
+    analyzer = SlowLookingAnalyzer(cache_dir=Path("journeys_cache"), near_duplicate_distance=5)
     library = JourneyLibrary(library_dir=Path("user_library"))
     
     # Example 1: Create a journey for a single artwork